@@ -0,0 +1,40 @@
+"""
+Measure the time to import sdf in a fresh interpreter
+
+    python benchmarks/import_time.py [-n RUNS]
+
+The heavy dependencies (NumPy, SciPy, h5py and the NDTable library) are
+imported on first use, so this should stay well below 100 ms.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+code = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "import sdf\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Measure the time to import sdf")
+    parser.add_argument("-n", type=int, default=10, help="number of runs")
+    args = parser.parse_args(args)
+
+    times = [
+        float(subprocess.check_output([sys.executable, "-c", code], text=True))
+        for _ in range(args.n)
+    ]
+
+    print(
+        "import sdf: min %.1f ms, median %.1f ms (%d runs)"
+        % (min(times) * 1e3, statistics.median(times) * 1e3, args.n)
+    )
+
+
+if __name__ == "__main__":
+    main()
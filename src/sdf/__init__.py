@@ -1,16 +1,45 @@
 from __future__ import annotations
 from os import PathLike
-import numpy as np
+from typing import IO, TYPE_CHECKING
 from .units import convert_unit
+import importlib
+import os
+from io import BytesIO
 import re
 from attrs import define, field
 
-from . import hdf5
+if TYPE_CHECKING:
+    import numpy as np
 
 __version__ = "0.3.7"
 
 _object_name_pattern = re.compile("[a-zA-Z][a-zA-Z0-9_]*")
 
+# submodules that are imported on first access (PEP 562)
+_submodules = {
+    "aio",
+    "arrow",
+    "cache",
+    "chunks",
+    "convert",
+    "decimation",
+    "dsres",
+    "expr",
+    "hdf5",
+    "io",
+    "ndtable",
+    "profile",
+    "virtual",
+    "zonemaps",
+}
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module("." + name, __name__)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 @define(eq=False)
 class Group:
@@ -78,6 +107,13 @@ class Dataset:
     def display_unit(self, value):
         self._display_unit = value
 
+    def decimate(self, n_bins: int = 1000, x_range: tuple[float, float] = None):
+        """Min/max decimate a 1-d dataset to at most 2 * `n_bins` samples in `x_range`"""
+
+        from . import decimation
+
+        return decimation.decimate(self, n_bins=n_bins, x_range=x_range)
+
     # some shorthand aliases
     @property
     def d(self):
@@ -119,18 +155,27 @@ def _validate_group(group, is_root=False):
 
 
 def _validate_dataset(ds: Dataset) -> list[str]:
+    import numpy as np
+
     if type(ds.data) is not np.ndarray:
         return ["Dataset.data must be a numpy.ndarray"]
 
     elif ds.data.size < 1:
         return ["Dataset.data must not be empty"]
 
-    elif not np.issubdtype(ds.data.dtype, np.float64):
-        return ["Dataset.data.dtype must be numpy.float64"]
+    elif (
+        ds.data.dtype.type not in {np.float32, np.float64}
+        and ds.data.dtype.kind not in "biu"
+    ):
+        return [
+            "Dataset.data.dtype must be numpy.float32, numpy.float64, an integer type or numpy.bool_"
+        ]
 
     if ds.is_scale:
         if len(ds.data.shape) != 1:
             return ["Scales must be one-dimensional"]
+        if ds.data.dtype.type not in {np.float32, np.float64}:
+            return ["Scales must be numpy.float32 or numpy.float64"]
         if np.any(np.diff(ds.data) <= 0):
             return ["Scales must be strictly monotonic increasing"]
     else:
@@ -144,20 +189,49 @@ def _validate_dataset(ds: Dataset) -> list[str]:
     return []
 
 
+# signature of HDF5 files
+_hdf5_signature = b"\x89HDF\r\n\x1a\n"
+
+
 def load(
-    filename: str | PathLike,
+    filename: str | PathLike | bytes | IO[bytes],
     objectname: str = "/",
     unit: str = None,
     scale_units: list[str] = None,
 ) -> Dataset | Group:
-    """Load a Dataset or Group from an SDF file"""
+    """Load a Dataset or Group from an SDF file
 
-    if filename.endswith(".mat"):
-        from . import dsres
+    `filename` may also be the content of a file (bytes) or a seekable binary
+    file-like object (e.g. io.BytesIO) in which case the format is detected
+    from the content.
+    """
 
-        obj = dsres.load(filename, objectname)
+    if isinstance(filename, (bytes, bytearray, memoryview)):
+        filename = BytesIO(filename)
+
+    if hasattr(filename, "read"):
+        start = filename.tell()
+        is_hdf5 = filename.read(len(_hdf5_signature)) == _hdf5_signature
+        filename.seek(start)
     else:
+        is_hdf5 = not os.fspath(filename).endswith(".mat")
+
+    if is_hdf5:
+        from . import hdf5
+
         obj = hdf5.load(filename, objectname)
+    else:
+        from . import dsres
+
+        obj = dsres.load(filename, objectname)
+
+    _check_units(obj, unit, scale_units)
+
+    return obj
+
+
+def _check_units(obj: Dataset | Group, unit: str, scale_units: list[str]) -> None:
+    """Assert the unit and scale units of a loaded Dataset"""
 
     if isinstance(obj, Dataset):
         # check the unit
@@ -188,10 +262,235 @@ def load(
                         % (i + 1, obj.name, scale_unit, scale.unit)
                     )
 
-    return obj
+
+def resample(
+    datasets: list[Dataset], new_time: np.typing.ArrayLike | Dataset, method="linear"
+) -> list[Dataset]:
+    """Resample 1-d datasets onto a common time grid
+
+    The scales may contain duplicate values (events) in which case the value
+    after the event is used. The brackets are located once for all datasets
+    that share a scale and their values are interpolated as one 2-d block.
+    Integer and boolean datasets are always resampled with "hold".
+
+    Parameters
+    ----------
+    datasets : list of Datasets
+        The 1-d datasets to resample.
+    new_time : ndarray or Dataset
+        The new time grid or a scale to use for the resampled datasets.
+    method : string, optional
+        The interpolation method (one of 'hold' or 'linear'). Outside the
+        scales the first and last values are held. Default is 'linear'.
+
+    Returns
+    -------
+    datasets : list of Datasets
+        The resampled datasets with the new time grid as scale.
+    """
+
+    import numpy as np
+
+    if method not in {"hold", "linear"}:
+        raise Exception('Unknown interpolation method "%s"' % method)
+
+    if isinstance(new_time, Dataset):
+        ds_time = new_time
+    else:
+        scale = datasets[0].scales[0] if datasets and datasets[0].scales else None
+        ds_time = Dataset(
+            "time" if scale is None else scale.name,
+            data=np.asarray(new_time, dtype=np.float64),
+            unit=None if scale is None else scale.unit,
+            is_scale=True,
+        )
+
+    t = np.asarray(ds_time.data)
+    blocks = {}
+
+    for i, ds in enumerate(datasets):
+        if ds.data.ndim != 1 or not ds.scales or ds.scales[0] is None:
+            raise Exception("Dataset '%s' must be 1-d and have a scale" % ds.name)
+        kind = ds.data.dtype.kind
+        m = "hold" if kind in "biu" else method
+        blocks.setdefault((id(ds.scales[0]), m, kind), []).append(i)
+
+    resampled = [None] * len(datasets)
+
+    for (_, m, _), indices in blocks.items():
+        x = np.asarray(datasets[indices[0]].scales[0].data)
+        y = np.stack([datasets[i].data for i in indices])
+
+        # index of the last sample <= t (after events)
+        j = np.clip(np.searchsorted(x, t, side="right") - 1, 0, x.size - 1)
+
+        if m == "hold" or x.size == 1:
+            values = y[:, j]
+        else:
+            j = np.minimum(j, x.size - 2)
+            dx = x[j + 1] - x[j]
+            w = np.where(dx > 0, (t - x[j]) / np.where(dx > 0, dx, 1), 1.0)
+            w = np.clip(w, 0.0, 1.0)
+            values = y[:, j] * (1 - w) + y[:, j + 1] * w
+
+        for i, v in zip(indices, values):
+            ds = datasets[i]
+            resampled[i] = Dataset(
+                ds.name,
+                comment=ds.comment,
+                attributes=dict(ds.attributes),
+                data=v,
+                display_name=ds._display_name,
+                relative_quantity=ds.relative_quantity,
+                unit=ds.unit,
+                display_unit=ds._display_unit,
+                scales=[ds_time],
+            )
+
+    return resampled
+
+
+def save(
+    filename: str | PathLike | IO[bytes],
+    group: Group,
+    decimation_threshold: int = None,
+    scale_offset: int = None,
+    compression_level: int = None,
+    zone_maps: bool = False,
+):
+    """Save an SDF group to a file
+
+    For 1-d datasets with a scale and more than `decimation_threshold` samples
+    min/max decimated levels are stored for fast plotting (see sdf.decimation).
+
+    If `scale_offset` is not None the floating point datasets (except scales)
+    are quantised to `scale_offset` decimal digits and the integer datasets are
+    stored with the minimum number of bits using the HDF5 scale-offset filter.
+
+    If `compression_level` is not None the other datasets are compressed with
+    the shuffle and deflate (gzip) filters at this level (0-9). The chunks are
+    compressed in parallel (see sdf.chunks).
+
+    If `zone_maps` is True the minimum, maximum and number of NaNs of the
+    blocks of the 1-d datasets are stored for where() (see sdf.zonemaps).
+
+    `filename` may also be a seekable binary file-like object (e.g. io.BytesIO).
+    """
+
+    from . import hdf5
+
+    hdf5.save(
+        filename,
+        group,
+        decimation_threshold=decimation_threshold,
+        scale_offset=scale_offset,
+        compression_level=compression_level,
+        zone_maps=zone_maps,
+    )
+
+
+def where(filename: str | PathLike, objectname: str, predicate) -> np.ndarray:
+    """Find the indices of the values of a 1-d dataset that match a predicate
+
+    Only the blocks whose zone map may match are read (see sdf.zonemaps.where()).
+    """
+
+    from . import zonemaps
+
+    return zonemaps.where(filename, objectname, predicate)
+
+
+def find(
+    source: str | PathLike | Group,
+    pattern: str | re.Pattern = None,
+    unit: str = None,
+    ndim: int = None,
+    has_scale: bool = None,
+):
+    """Find datasets by path, unit, number of dimensions and scale
+
+    Yields the paths (e.g. "/a/b/x") of the matching datasets of a Group, an
+    SDF file or a Dymola result file. Only the metadata of the files is read.
+
+    Parameters
+    ----------
+    source : str or Group
+        The file or Group to search.
+    pattern : str or re.Pattern, optional
+        A glob pattern (e.g. "*/T") or a compiled regular expression that must
+        match the path.
+    unit : str, optional
+        The unit of the datasets.
+    ndim : int, optional
+        The number of dimensions of the datasets.
+    has_scale : bool, optional
+        Whether the datasets have a scale.
+    """
+
+    if isinstance(pattern, str):
+        import fnmatch
+
+        pattern = re.compile(fnmatch.translate(pattern))
+
+    if isinstance(source, Group):
+        items = _walk_group(source)
+    elif os.fspath(source).endswith(".mat"):
+        from . import dsres
+
+        items = dsres._walk(source)
+    else:
+        from . import hdf5
+
+        items = hdf5._walk(source)
+
+    for path, unit_, ndim_, has_scale_ in items:
+        if (
+            (unit is None or unit == unit_)
+            and (ndim is None or ndim == ndim_)
+            and (has_scale is None or has_scale == has_scale_)
+            and (pattern is None or pattern.match(path))
+        ):
+            yield path
+
+
+def _walk_group(group):
+    """Yield (path, unit, ndim, has_scale) of the datasets of a Group"""
+
+    stack = [(group, "/")]
+
+    while stack:
+        g, path = stack.pop()
+
+        for ds in g.datasets:
+            has_scale = any(s is not None for s in ds.scales)
+            yield path + ds.name, ds.unit, ds.data.ndim, has_scale
+
+        for child in reversed(g.groups):
+            stack.append((child, path + child.name + "/"))
+
+
+def open(filename: str | PathLike, mode: str = "r+"):
+    """Open an SDF file to add, replace or delete objects in place
+
+    Returns an sdf.hdf5.Editor (use as a context manager).
+    """
+
+    from . import hdf5
+
+    return hdf5.Editor(filename, mode)
+
+
+def loads(
+    content: bytes, objectname: str = "/", unit: str = None, scale_units=None
+) -> Dataset | Group:
+    """Load a Dataset or Group from the content of an SDF or Dymola result file"""
+
+    return load(content, objectname, unit, scale_units)
 
 
-def save(filename: str | PathLike, group: Group):
-    """Save an SDF group to a file"""
+def dumps(group: Group, **kwargs) -> bytes:
+    """Save an SDF group to bytes (see save() for the keyword arguments)"""
 
-    hdf5.save(filename, group)
+    f = BytesIO()
+    save(f, group, **kwargs)
+    return f.getvalue()
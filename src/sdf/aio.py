@@ -0,0 +1,132 @@
+"""
+Coroutines to load and save SDF files without blocking the event loop
+
+The reads run on a bounded thread pool. Concurrent requests for the same
+object in the same file are coalesced into one read. All the data is read on
+the thread pool (also for the lazily loaded objects of Dymola results).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+
+import sdf
+from . import cache
+
+# maximum number of concurrent reads and writes
+max_workers = 4
+
+_executor = None
+
+# (loop, path, objectname) -> [future, number of waiters]
+_pending = {}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sdf.aio"
+        )
+
+    return _executor
+
+
+def shutdown(wait: bool = True) -> None:
+    """Shut down the thread pool (a new one is created on the next call)"""
+
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+
+
+def _load(filename, objectname):
+    """Load an object and read all of its data"""
+
+    obj = cache._copy(sdf.load(filename, objectname))
+
+    # the arrays are shared by the callers
+    cache._freeze(obj)
+
+    return obj
+
+
+def _remove_pending(key, entry):
+    if _pending.get(key) is entry:
+        del _pending[key]
+
+
+def _call_soon_threadsafe(loop, callback, *args):
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # the loop has been closed
+        callback(*args)
+
+
+async def load(
+    filename: str | PathLike,
+    objectname: str = "/",
+    unit: str = None,
+    scale_units: list[str] = None,
+) -> sdf.Dataset | sdf.Group:
+    """Load a Dataset or Group from an SDF file (see sdf.load())
+
+    Callers that request the same object concurrently share one read. Every
+    caller receives its own Group and Dataset objects, but the data arrays
+    are shared and read-only. Cancelling a caller does not affect the other
+    callers. When all
+    callers have been cancelled a read that has not started yet is dropped,
+    but a running read cannot be interrupted and completes on its thread.
+    Requests made until then wait for that read instead of starting another.
+    """
+
+    filename = os.fspath(filename)
+    loop = asyncio.get_running_loop()
+    key = (loop, os.path.abspath(filename), objectname)
+
+    entry = _pending.get(key)
+
+    if entry is None or entry[0].cancelled():
+        # the entry is removed when the thread has finished (not when the
+        # waiters have been cancelled)
+        future = _get_executor().submit(_load, filename, objectname)
+        entry = [future, 0]
+        _pending[key] = entry
+        future.add_done_callback(
+            lambda _: _call_soon_threadsafe(loop, _remove_pending, key, entry)
+        )
+
+    future = entry[0]
+    entry[1] += 1
+
+    try:
+        obj = await asyncio.shield(asyncio.wrap_future(future))
+    except asyncio.CancelledError:
+        entry[1] -= 1
+        if entry[1] == 0:
+            # only succeeds if the read has not started yet
+            future.cancel()
+        raise
+
+    entry[1] -= 1
+
+    obj = cache._copy(obj)
+
+    sdf._check_units(obj, unit, scale_units)
+
+    return obj
+
+
+async def save(filename: str | PathLike, group: sdf.Group) -> None:
+    """Save an SDF group to a file (see sdf.save())"""
+
+    loop = asyncio.get_running_loop()
+
+    await loop.run_in_executor(_get_executor(), sdf.save, filename, group)
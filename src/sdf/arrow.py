@@ -0,0 +1,297 @@
+"""
+Export time series to Apache Arrow and Parquet (requires pyarrow)
+
+One-dimensional datasets that share a scale become one table with the scale
+as its first column. The tables are read and written in chunks of rows so the
+memory usage is bounded by the chunk size and not by the size of the file.
+"""
+
+from __future__ import annotations
+
+import os
+from os import PathLike
+
+import h5py
+import numpy as np
+from attrs import define
+
+import sdf
+from .hdf5 import _to_python_str
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "pyarrow is required to export to Arrow and Parquet (pip install pyarrow)"
+        )
+
+    return pyarrow
+
+
+@define
+class _Column:
+    """A column of a table (data is an h5py.Dataset, numpy.ndarray or _Trajectory)"""
+
+    name: str
+    data: object
+    unit: str = None
+    comment: str = None
+
+
+def _hdf5_columns(f, objectname):
+    """Collect the columns of an HDF5 file by scale without reading any data"""
+
+    tables = {}
+    stack = [f[objectname]]
+
+    while stack:
+        gobj = stack.pop()
+
+        for item in gobj.values():
+            if isinstance(item, h5py.Group):
+                stack.append(item)
+            elif item.ndim == 1 and item.dims[0]:
+                scale = item.dims[0][0]
+                if scale.name not in tables:
+                    tables[scale.name] = [_hdf5_column(scale)]
+                if item.name != scale.name:
+                    tables[scale.name].append(_hdf5_column(item))
+
+    return tables
+
+
+def _hdf5_column(dsobj):
+    unit = dsobj.attrs.get("UNIT")
+    comment = dsobj.attrs.get("COMMENT")
+
+    return _Column(
+        name=dsobj.name.lstrip("/"),
+        data=dsobj,
+        unit=None if unit is None else _to_python_str(unit),
+        comment=None if comment is None else _to_python_str(comment),
+    )
+
+
+def _group_columns(group):
+    """Collect the columns of an sdf.Group by scale"""
+
+    paths = {}
+    datasets = []
+    stack = [(group, "")]
+
+    while stack:
+        g, path = stack.pop()
+
+        for child in g.groups:
+            stack.append((child, path + child.name + "/"))
+
+        for ds in g.datasets:
+            paths[id(ds)] = path + ds.name
+            datasets.append(ds)
+
+    tables = {}
+
+    for ds in datasets:
+        if ds.data.ndim != 1 or not ds.scales or ds.scales[0] is None:
+            continue
+
+        scale = ds.scales[0]
+        name = paths.get(id(scale), scale.name)
+
+        if name not in tables:
+            tables[name] = [_Column(name, scale.data, scale.unit, scale.comment)]
+
+        if ds is not scale:
+            tables[name].append(_Column(paths[id(ds)], ds.data, ds.unit, ds.comment))
+
+    return tables
+
+
+class _Rows:
+    """Reads blocks of rows of the trajectories of a Dymola result
+
+    The last block is kept so the columns of a record batch are taken from
+    one read.
+    """
+
+    def __init__(self, traj):
+        self.traj = traj
+        self._key = None
+        self._block = None
+
+    def __call__(self, start, stop):
+        if self._key != (start, stop):
+            # release the previous block before the next one is read
+            self._block = None
+            self._block = np.asarray(self.traj[:, start:stop])
+            self._key = (start, stop)
+
+        return self._block
+
+
+@define
+class _Trajectory:
+    """A trajectory of a Dymola result that is read in blocks of rows"""
+
+    rows: _Rows
+    column: int
+    sign: int
+    dtype: np.dtype
+
+    def __len__(self):
+        return self.rows.traj.shape[1]
+
+    def __getitem__(self, key):
+        values = self.rows(key.start, key.stop)[self.column]
+        values = values if self.sign >= 0 else -values
+        return values.astype(self.dtype, copy=False)
+
+
+def _dsres_columns(filename, objectname):
+    """Collect the trajectories of a Dymola result without reading any data"""
+
+    from .dsres import _data_type, _read_mat, _split_description
+
+    names, descr, d, x, _, traj = _read_mat(filename)
+
+    prefix = ".".join(s for s in objectname.split("/") if s)
+    rows = _Rows(traj)
+    time = None
+    columns = []
+
+    for name, desc, d_, x_ in zip(names, descr, d, x):
+        if d_ == 1:
+            continue
+
+        if d_ != 0 and prefix and not (name == prefix or name.startswith(prefix + ".")):
+            continue
+
+        unit, _, comment, info = _split_description(desc)
+        dtype = np.dtype(_data_type(info) or traj.dtype)
+        data = _Trajectory(rows, abs(int(x_)) - 1, int(np.sign(x_)), dtype)
+
+        if d_ == 0:
+            if time is None:
+                time = _Column(name, data, unit, "Simulation time")
+            continue
+
+        if name.startswith(prefix + "."):
+            name = name[len(prefix) + 1 :]
+        elif prefix:
+            name = name.split(".")[-1]
+
+        columns.append(_Column(name.replace(".", "/"), data, unit, comment))
+
+    if time is None or not columns:
+        return {}
+
+    return {time.name: [time] + columns}
+
+
+def _schema(pa, columns):
+    fields = []
+
+    for column in columns:
+        metadata = {}
+        if column.unit:
+            metadata["unit"] = column.unit
+        if column.comment:
+            metadata["comment"] = column.comment
+        dtype = pa.from_numpy_dtype(np.dtype(column.data.dtype))
+        fields.append(pa.field(column.name, dtype, metadata=metadata or None))
+
+    return pa.schema(fields)
+
+
+def _batches(pa, schema, columns, chunk_size):
+    n = len(columns[0].data)
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        arrays = [np.asarray(column.data[start:stop]) for column in columns]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _tables(source, objectname):
+    if isinstance(source, sdf.Group):
+        return None, _group_columns(source)
+
+    filename = os.fspath(source)
+
+    if filename.endswith(".mat"):
+        return None, _dsres_columns(filename, objectname)
+
+    f = h5py.File(filename, "r")
+
+    return f, _hdf5_columns(f, objectname)
+
+
+def to_record_batches(
+    source: str | PathLike | sdf.Group,
+    objectname: str = "/",
+    chunk_size: int = 65536,
+):
+    """Export the time series of an SDF file or Group as Arrow record batches
+
+    Yields the tuples (table name, record batch) where the table name is the
+    path of the shared scale. The batches of a table are yielded consecutively.
+    """
+
+    pa = _import_pyarrow()
+
+    f, tables = _tables(source, objectname)
+
+    try:
+        for name, columns in tables.items():
+            # skip the columns that do not match the length of the scale
+            n = len(columns[0].data)
+            columns = [column for column in columns if len(column.data) == n]
+            schema = _schema(pa, columns)
+            for batch in _batches(pa, schema, columns, chunk_size):
+                yield name, batch
+    finally:
+        if f is not None:
+            f.close()
+
+
+def to_parquet(
+    source: str | PathLike | sdf.Group,
+    directory: str | PathLike,
+    objectname: str = "/",
+    chunk_size: int = 65536,
+) -> list[str]:
+    """Export the time series of an SDF file or Group to Parquet files
+
+    Writes one Parquet file per shared scale to `directory` with one row group
+    per chunk of `chunk_size` rows and returns the paths of the written files.
+    """
+
+    _import_pyarrow()
+
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+
+    filenames = []
+    writer = None
+    current = None
+
+    try:
+        for name, batch in to_record_batches(source, objectname, chunk_size):
+            if name != current:
+                if writer is not None:
+                    writer.close()
+                filename = os.path.join(
+                    directory, name.strip("/").replace("/", ".") + ".parquet"
+                )
+                writer = pq.ParquetWriter(filename, batch.schema)
+                filenames.append(filename)
+                current = name
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return filenames
@@ -0,0 +1,222 @@
+"""
+Process-wide cache of loaded objects
+
+The catalogues of Dymola results (the variable info and the trajectories
+that have been read) are cached by default. Set `enabled` to True to also
+cache the objects loaded from SDF files. Files are identified by their
+absolute path, inode, modification and change time, size and a checksum of
+their first and last bytes, so a file that has been rewritten is read again
+without the writer having to evict it. The files are not kept open between
+loads.
+
+Every load of an SDF file returns new Group and Dataset objects but the data
+arrays are shared between them and are read-only. The objects are evicted in
+least-recently-used order.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from os import PathLike
+
+import numpy as np
+from attrs import fields
+
+import sdf
+
+# set to True to cache the objects loaded from SDF files
+enabled = False
+
+# set to False to read the catalogues of Dymola results for every load
+catalogs = True
+
+# maximum total size of the data arrays of the cached objects
+max_bytes = 256 * 2**20
+
+# number of bytes at the start and end of a file that are checksummed
+_check_bytes = 2**16
+
+_lock = threading.RLock()
+
+# (file key, objectname) -> (object, size)
+_objects = OrderedDict()
+
+_nbytes = 0
+
+
+def file_key(filename: str | PathLike) -> tuple:
+    """Get the key (path, inode, mtime, ctime, size, checksum) of a file"""
+
+    path = os.path.abspath(os.fspath(filename))
+
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        checksum = zlib.crc32(f.read(_check_bytes))
+
+        if st.st_size > _check_bytes:
+            f.seek(max(_check_bytes, st.st_size - _check_bytes))
+            checksum = zlib.crc32(f.read(_check_bytes), checksum)
+
+    return path, st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size, checksum
+
+
+def _sizeof(obj) -> int:
+    """Get the total size of the data arrays of a Group, Dataset or other object"""
+
+    nbytes = 0
+    visited = set()
+    stack = [obj]
+
+    while stack:
+        obj = stack.pop()
+
+        if obj is None or id(obj) in visited:
+            continue
+
+        visited.add(id(obj))
+
+        if isinstance(obj, sdf.Group):
+            stack += obj.groups
+            stack += obj.datasets
+        elif isinstance(obj, sdf.Dataset):
+            nbytes += getattr(obj.data, "nbytes", 0)
+            stack += obj.scales
+        else:
+            nbytes += getattr(obj, "nbytes", 0)
+
+    return nbytes
+
+
+def _freeze(obj, visited=None) -> None:
+    """Make the data arrays of a Group or Dataset read-only"""
+
+    if visited is None:
+        visited = set()
+
+    if obj is None or id(obj) in visited:
+        return
+
+    visited.add(id(obj))
+
+    if isinstance(obj, sdf.Group):
+        for child in obj.groups + obj.datasets:
+            _freeze(child, visited)
+    elif isinstance(obj, sdf.Dataset):
+        if isinstance(obj.data, np.ndarray):
+            obj.data.flags.writeable = False
+        for scale in obj.scales:
+            _freeze(scale, visited)
+
+
+def _copy(obj, copies=None):
+    """Copy a Group or Dataset (the data arrays are shared)
+
+    The copies are sdf.Group and sdf.Dataset objects, so the lazy objects of
+    a Dymola catalogue are read when they are copied.
+    """
+
+    if copies is None:
+        copies = {}
+
+    if obj is None:
+        return None
+
+    if id(obj) in copies:
+        return copies[id(obj)]
+
+    if isinstance(obj, sdf.Group):
+        copy = _new(sdf.Group, obj, {"groups", "datasets"})
+        copies[id(obj)] = copy
+        copy.groups = [_copy(g, copies) for g in obj.groups]
+        copy.datasets = [_copy(ds, copies) for ds in obj.datasets]
+    elif isinstance(obj, sdf.Dataset):
+        copy = _new(sdf.Dataset, obj, {"scales"})
+        copies[id(obj)] = copy
+        copy.scales = [_copy(s, copies) for s in obj.scales]
+    else:
+        return obj
+
+    return copy
+
+
+def _new(cls, obj, exclude):
+    """Create an instance of `cls` with the attributes of `obj`"""
+
+    # the arguments of private attributes have no leading underscore
+    kwargs = {
+        a.name.lstrip("_"): getattr(obj, a.name)
+        for a in fields(cls)
+        if a.name not in exclude
+    }
+    kwargs["attributes"] = dict(obj.attributes)
+
+    return cls(**kwargs)
+
+
+def cached(filename: str | PathLike, objectname: str, load, enable: bool = None):
+    """Get an object from the cache or call load() and add the result
+
+    Groups and Datasets are returned as copies with read-only data arrays.
+    Other objects (e.g. the catalogue of a Dymola result) are shared.
+    `enable` overrides `enabled` for this call.
+    """
+
+    global _nbytes
+
+    if not (enabled if enable is None else enable):
+        return load()
+
+    key = (file_key(filename), objectname)
+
+    with _lock:
+        if key in _objects:
+            _objects.move_to_end(key)
+            return _copy(_objects[key][0])
+
+    obj = load()
+    nbytes = _sizeof(obj)
+
+    if nbytes > max_bytes:
+        return obj
+
+    _freeze(obj)
+
+    with _lock:
+        # remove the objects of previous versions of the file
+        for k in [k for k in _objects if k[0][0] == key[0][0] and k[0] != key[0]]:
+            _nbytes -= _objects.pop(k)[1]
+
+        if key not in _objects:
+            _objects[key] = (obj, nbytes)
+            _nbytes += nbytes
+
+        while _nbytes > max_bytes:
+            _, (_, size) = _objects.popitem(last=False)
+            _nbytes -= size
+
+    return _copy(obj)
+
+
+def evict(filename: str | PathLike) -> None:
+    """Remove the cached objects of a file"""
+
+    global _nbytes
+
+    path = os.path.abspath(os.fspath(filename))
+
+    with _lock:
+        for key in [key for key in _objects if key[0][0] == path]:
+            _nbytes -= _objects.pop(key)[1]
+
+
+def clear() -> None:
+    """Remove all cached objects"""
+
+    global _nbytes
+
+    with _lock:
+        _objects.clear()
+        _nbytes = 0
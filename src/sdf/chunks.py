@@ -0,0 +1,256 @@
+"""
+Parallel compression and decompression of chunked HDF5 datasets
+
+The chunks of deflate (gzip) compressed datasets are (de)compressed with zlib
+on a thread pool (zlib releases the GIL) and written and read with the direct
+chunk I/O of HDF5. The datasets use the standard shuffle and deflate filters
+and can be read by any HDF5 application.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import h5py
+import numpy as np
+
+# maximum number of threads that (de)compress chunks
+max_workers = os.cpu_count() or 1
+
+# approximate size of a chunk in bytes
+chunk_bytes = 2**20
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sdf.chunks"
+        )
+
+    return _executor
+
+
+def chunk_shape(shape: tuple[int, ...], itemsize: int) -> tuple[int, ...]:
+    """Get a chunk shape of about `chunk_bytes` that splits only the first axis"""
+
+    row_size = max(1, int(np.prod(shape[1:], dtype=np.int64)) * itemsize)
+    rows = max(1, min(shape[0], chunk_bytes // row_size))
+
+    return (rows,) + tuple(shape[1:])
+
+
+def _shuffle(buffer: bytes, itemsize: int) -> bytes:
+    """Group the bytes of the elements by significance (HDF5 shuffle filter)"""
+
+    if itemsize == 1:
+        return buffer
+
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def _unshuffle(buffer: bytes, itemsize: int) -> bytes:
+    """Reverse _shuffle()"""
+
+    if itemsize == 1:
+        return buffer
+
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(itemsize, -1).T.tobytes()
+
+
+def _compress(block: np.ndarray, level: int, shuffle: bool) -> bytes:
+    buffer = block.tobytes()
+
+    if shuffle:
+        buffer = _shuffle(buffer, block.dtype.itemsize)
+
+    return zlib.compress(buffer, level)
+
+
+def create_dataset(
+    gobj: h5py.Group,
+    name: str,
+    data: np.ndarray,
+    compression_level: int = 4,
+    shuffle: bool = True,
+) -> h5py.Dataset:
+    """Create a deflate compressed dataset and compress its chunks in parallel"""
+
+    data = np.ascontiguousarray(data)
+
+    dsobj = gobj.create_dataset(
+        name,
+        shape=data.shape,
+        dtype=data.dtype,
+        chunks=chunk_shape(data.shape, data.dtype.itemsize),
+        compression="gzip",
+        compression_opts=compression_level,
+        shuffle=shuffle and data.dtype.itemsize > 1,
+    )
+
+    write(dsobj, data, compression_level, shuffle)
+
+    return dsobj
+
+
+def write(
+    dsobj: h5py.Dataset, data: np.ndarray, compression_level: int, shuffle: bool
+) -> None:
+    """Compress and write the chunks of a dataset created by create_dataset()"""
+
+    write_blocks(
+        dsobj, lambda start, stop: data[start:stop], compression_level, shuffle
+    )
+
+
+def write_blocks(
+    dsobj: h5py.Dataset,
+    block,
+    compression_level: int | None,
+    shuffle: bool,
+    parallel: bool = True,
+) -> None:
+    """Compress and write the chunks of a dataset that is chunked along its first axis
+
+    block(start, stop) returns the rows [start, stop) of a chunk. The blocks
+    are computed and compressed on the thread pool if `parallel` is True. If
+    `compression_level` is None the blocks are written without compression.
+    """
+
+    rows = dsobj.chunks[0]
+    nrows = dsobj.shape[0]
+    zeros = (0,) * (dsobj.ndim - 1)
+    shuffle = shuffle and dsobj.dtype.itemsize > 1
+
+    def compress(start):
+        data = np.asarray(block(start, min(start + rows, nrows)), dtype=dsobj.dtype)
+
+        if compression_level is None:
+            return data
+
+        # edge chunks are stored with the full chunk shape
+        if data.shape[0] < rows:
+            padded = np.zeros(dsobj.chunks, dtype=dsobj.dtype)
+            padded[: data.shape[0]] = data
+            data = padded
+
+        return _compress(data, compression_level, shuffle)
+
+    starts = range(0, nrows, rows)
+
+    for start, chunk in zip(starts, _map(compress, starts, parallel)):
+        if compression_level is None:
+            dsobj[start : start + chunk.shape[0]] = chunk
+        else:
+            dsobj.id.write_direct_chunk((start,) + zeros, chunk)
+
+
+def _map(func, items, parallel=True):
+    """Map func() over the items in order (on the thread pool if `parallel` is True)"""
+
+    if not parallel:
+        yield from map(func, items)
+        return
+
+    executor = _get_executor()
+
+    # limit the number of results in memory
+    batch = 4 * max_workers
+
+    for i in range(0, len(items), batch):
+        yield from executor.map(func, items[i : i + batch])
+
+
+def _filters(dsobj: h5py.Dataset) -> list[int]:
+    """Get the IDs of the filters of a dataset in the order of the pipeline"""
+
+    dcpl = dsobj.id.get_create_plist()
+
+    return [dcpl.get_filter(i)[0] for i in range(dcpl.get_nfilters())]
+
+
+def read(dsobj: h5py.Dataset) -> np.ndarray:
+    """Read a dataset and decompress its chunks in parallel
+
+    Datasets that are not deflate compressed, use other filters or have only
+    one chunk are read with dsobj[()].
+    """
+
+    filters = _filters(dsobj) if dsobj.chunks else []
+
+    if (
+        h5py.h5z.FILTER_DEFLATE not in filters
+        or not set(filters) <= {h5py.h5z.FILTER_DEFLATE, h5py.h5z.FILTER_SHUFFLE}
+        or dsobj.dtype.kind not in "biuf"
+    ):
+        return dsobj[()]
+
+    offsets = _chunk_offsets(dsobj)
+
+    if offsets is not None and len(offsets) < 2:
+        return dsobj[()]
+
+    shape = dsobj.shape
+    chunk = dsobj.chunks
+    dtype = dsobj.dtype
+    grid = [range(0, s, c) for s, c in zip(shape, chunk)]
+    data = np.empty(shape, dtype=dtype)
+    allocated = offsets is not None
+
+    # chunks that have not been written contain the fill value
+    if not allocated or len(offsets) < np.prod([len(r) for r in grid]):
+        data[...] = dsobj.fillvalue
+
+    if not allocated:
+        # visit the chunk grid and skip the chunks that have not been written
+        offsets = itertools.product(*grid)
+
+    def decompress(offset):
+        if (
+            not allocated
+            and dsobj.id.get_chunk_info_by_coord(offset).byte_offset is None
+        ):
+            return
+
+        filter_mask, buffer = dsobj.id.read_direct_chunk(offset)
+
+        # undo the filters that have not been skipped in reverse order
+        for j in reversed(range(len(filters))):
+            if filter_mask & (1 << j):
+                continue
+            elif filters[j] == h5py.h5z.FILTER_DEFLATE:
+                buffer = zlib.decompress(buffer)
+            else:
+                buffer = _unshuffle(buffer, dtype.itemsize)
+
+        block = np.frombuffer(buffer, dtype=dtype).reshape(chunk)
+        target = tuple(slice(o, min(o + c, s)) for o, c, s in zip(offset, chunk, shape))
+        data[target] = block[tuple(slice(0, t.stop - t.start) for t in target)]
+
+    # re-raise the exceptions of the workers
+    for _ in _get_executor().map(decompress, offsets):
+        pass
+
+    return data
+
+
+def _chunk_offsets(dsobj: h5py.Dataset) -> list[tuple[int, ...]] | None:
+    """Get the offsets of the written chunks with one pass over the chunk index
+
+    Returns None if HDF5 does not support iterating over the chunks (< 1.12.3).
+    """
+
+    offsets = []
+
+    try:
+        dsobj.id.chunk_iter(lambda info: offsets.append(info.chunk_offset))
+    except (AttributeError, NotImplementedError):
+        return None
+
+    return offsets
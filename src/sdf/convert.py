@@ -0,0 +1,277 @@
+"""
+Convert Dymola result files to SDF
+
+    python -m sdf.convert [-o OUTPUT_DIR] [-j JOBS] INPUT [INPUT ...]
+
+Only MAT v4 result files (as written by Dymola) are supported. The
+trajectories are read in blocks of rows ("binTrans") or as the segments of
+the chunks ("binNormal") that are collected in a buffer until one chunk of
+every trajectory is complete, so the memory usage does not depend on the size
+of the file and data_2 is read once. The chunks are compressed in parallel and written
+directly. Aliases of the same column with the same unit and comment are
+written once and linked.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from os import PathLike
+
+import h5py
+import numpy as np
+
+from . import chunks
+from .dsres import _data_type, _open_mat4, _split_description
+from .hdf5 import _str
+
+
+def convert(
+    infile: str | PathLike,
+    outfile: str | PathLike = None,
+    compression_level: int = 4,
+    block_size: int = 64 * 2**20,
+    chunk_bytes: int = None,
+    buffer_size: int = 2**30,
+) -> str:
+    """Convert a Dymola result file (MAT v4) to SDF
+
+    Parameters
+    ----------
+    infile : str
+        The Dymola result file (.mat) to convert.
+    outfile : str, optional
+        The SDF file to write. Default is `infile` with the extension ".sdf".
+    compression_level : int, optional
+        The gzip compression level (0-9) or None to write uncompressed datasets.
+    block_size : int, optional
+        The approximate number of bytes to read per block of rows.
+    chunk_bytes : int, optional
+        The approximate size of the HDF5 chunks of the trajectories (default
+        is chunks.chunk_bytes).
+    buffer_size : int, optional
+        The maximum size of the buffer that collects the blocks until one
+        chunk of every trajectory is complete. The chunks are made smaller if
+        the chunks of all trajectories together would exceed it.
+
+    Returns
+    -------
+    outfile : str
+        The name of the SDF file.
+    """
+
+    infile = os.fspath(infile)
+
+    if outfile is None:
+        outfile = os.path.splitext(infile)[0] + ".sdf"
+
+    names, descr, d, x, cons, traj = _open_mat4(infile)
+
+    # data_1 is small and read at once
+    cons = np.asarray(cons)
+
+    c = np.abs(x) - 1  # column
+    s = np.sign(x)  # sign
+
+    nrows = traj.shape[1]
+    itemsize = traj.dtype.itemsize
+
+    # the columns of data_2 that are collected in the slab
+    columns = np.unique(c[d != 1]).astype(np.intp)
+    slab_index = {int(c_): i for i, c_ in enumerate(columns)}
+
+    # the chunk size does not depend on the number of trajectories unless the
+    # slab for one chunk of every trajectory would exceed the buffer size
+    if chunk_bytes is None:
+        chunk_bytes = chunks.chunk_bytes
+
+    chunk_rows = min(
+        max(1, chunk_bytes // itemsize),
+        max(1, nrows),
+        max(1, buffer_size // max(1, columns.size * itemsize)),
+    )
+
+    if compression_level is None:
+        compression = {}
+    else:
+        compression = dict(
+            compression="gzip", compression_opts=compression_level, shuffle=True
+        )
+
+    with h5py.File(outfile, "w") as f:
+        h5_time = None
+        trajectories = []
+        aliases = {}
+
+        for name, desc, d_, c_, s_ in zip(names, descr, d, c, s):
+            unit, display_unit, comment, info = _split_description(desc)
+
+            path = "/" + name.replace(".", "/")
+
+            if d_ == 0:
+                comment = "Simulation time"
+
+            if d_ == 1:
+                data = np.asarray(cons[c_, 0] * s_)
+                dtype = _data_type(info)
+                if dtype is not None:
+                    data = np.asarray(data, dtype=dtype)
+                f[path] = data
+            else:
+                dtype = _data_type(info) or traj.dtype
+                key = (c_, s_, np.dtype(dtype), unit, display_unit, comment)
+
+                if key in aliases:
+                    f[path] = aliases[key]
+                    continue
+
+                dsobj = f.create_dataset(
+                    path,
+                    shape=(nrows,),
+                    dtype=dtype,
+                    chunks=(chunk_rows,) if nrows > 0 else None,
+                    **(compression if nrows > 0 else {}),
+                )
+
+                aliases[key] = dsobj
+                trajectories.append((dsobj, slab_index[int(c_)], s_))
+
+                if d_ == 0:
+                    h5_time = dsobj
+
+            dsobj = f[path]
+
+            if comment:
+                dsobj.attrs["COMMENT"] = _str(comment)
+
+            if unit:
+                dsobj.attrs["UNIT"] = _str(unit)
+
+            if display_unit and display_unit != unit:
+                dsobj.attrs["DISPLAY_UNIT"] = _str(display_unit)
+
+        # collect the blocks of rows until one chunk of every trajectory is
+        # complete and write the chunks
+        if getattr(traj, "_transposed", False):
+            # "binNormal": the trajectories are contiguous and the segments of
+            # the chunk are read directly
+            read_rows = chunk_rows
+        else:
+            read_rows = max(1, block_size // max(1, traj.shape[0] * itemsize))
+
+        slab = np.empty((columns.size, chunk_rows), dtype=traj.dtype)
+
+        for start in range(0, nrows, chunk_rows):
+            stop = min(start + chunk_rows, nrows)
+
+            for i in range(start, stop, read_rows):
+                j = min(i + read_rows, stop)
+                slab[:, i - start : j - start] = traj[columns, i:j]
+
+            _write_slab(trajectories, slab[:, : stop - start], start, compression_level)
+
+        # attach the time scale
+        if h5_time is not None:
+            h5py.h5ds.set_scale(h5_time.id, _str(h5_time.name.split("/")[-1]))
+            for dsobj, _, _ in trajectories:
+                if dsobj != h5_time:
+                    dsobj.dims[0].attach_scale(h5_time)
+
+    return outfile
+
+
+def _write_slab(dsobjs, slab, start, compression_level):
+    """Write the rows of the slab to one chunk of every trajectory"""
+
+    rows = slab.shape[1]
+
+    def values(dsobj, i, s_):
+        data = slab[i] if s_ >= 0 else -slab[i]
+        return data.astype(dsobj.dtype, copy=False)
+
+    if compression_level is None:
+        for dsobj, i, s_ in dsobjs:
+            dsobj[start : start + rows] = values(dsobj, i, s_)
+        return
+
+    def compress(item):
+        dsobj, i, s_ = item
+        block = values(dsobj, i, s_)
+
+        # edge chunks are stored with the full chunk shape
+        if rows < dsobj.chunks[0]:
+            padded = np.zeros(dsobj.chunks, dtype=dsobj.dtype)
+            padded[:rows] = block
+            block = padded
+
+        return chunks._compress(block, compression_level, dsobj.dtype.itemsize > 1)
+
+    for (dsobj, _, _), chunk in zip(dsobjs, chunks._map(compress, dsobjs)):
+        dsobj.id.write_direct_chunk((start,), chunk)
+
+
+def _convert(args):
+    return convert(*args)
+
+
+def convert_files(
+    infiles: list[str | PathLike],
+    output_dir: str | PathLike = None,
+    jobs: int = 1,
+    compression_level: int = 4,
+) -> list[str]:
+    """Convert Dymola result files to SDF using `jobs` processes"""
+
+    tasks = []
+
+    for infile in infiles:
+        outfile = os.path.splitext(os.fspath(infile))[0] + ".sdf"
+        if output_dir is not None:
+            outfile = os.path.join(output_dir, os.path.basename(outfile))
+        tasks.append((infile, outfile, compression_level))
+
+    if jobs == 1:
+        return [_convert(task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_convert, tasks))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m sdf.convert", description="Convert Dymola result files to SDF"
+    )
+    parser.add_argument("inputs", nargs="+", help="result files or directories")
+    parser.add_argument("-o", "--output-dir", help="directory for the SDF files")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="number of parallel conversions"
+    )
+    parser.add_argument(
+        "-c", "--compression-level", type=int, default=4, help="gzip level (0-9)"
+    )
+    args = parser.parse_args(args)
+
+    infiles = []
+
+    for path in args.inputs:
+        if os.path.isdir(path):
+            infiles += sorted(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.endswith(".mat")
+            )
+        else:
+            infiles.append(path)
+
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    for outfile in convert_files(
+        infiles, args.output_dir, args.jobs, args.compression_level
+    ):
+        print(outfile)
+
+
+if __name__ == "__main__":
+    main()
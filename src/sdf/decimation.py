@@ -0,0 +1,207 @@
+"""
+Min/max decimation of time series for plotting
+
+A signal is divided into bins of equal size and only the minimum and maximum
+of every bin are kept (in their original order), so peaks remain visible.
+sdf.save() can store a pyramid of decimated levels next to large time series
+(see `decimation_threshold`) that load() uses to fetch an appropriate level
+for the visible range without reading the full dataset.
+"""
+
+from __future__ import annotations
+
+import os
+from os import PathLike
+
+import h5py
+import numpy as np
+
+import sdf
+from . import hdf5
+
+# ratio of the bin sizes of two consecutive levels
+factor = 16
+
+# group of the decimated levels
+_levels_group = "/_sdf/min_max"
+
+
+def min_max(x: np.ndarray, y: np.ndarray, n_bins: int) -> tuple[np.ndarray, np.ndarray]:
+    """Decimate the samples (x, y) to the minimum and maximum of `n_bins` bins"""
+
+    if y.size <= 2 * n_bins:
+        return x, y
+
+    return _min_max(x, y, -(-y.size // n_bins))
+
+
+def _min_max(x, y, bin_size):
+    """Decimate (x, y) to the minimum and maximum of bins of `bin_size` samples"""
+
+    n = y.size
+    n_full = n - n % bin_size
+
+    blocks = y[:n_full].reshape(-1, bin_size)
+    offsets = np.arange(0, n_full, bin_size)
+    i_min = np.argmin(blocks, axis=1) + offsets
+    i_max = np.argmax(blocks, axis=1) + offsets
+
+    if n_full < n:
+        i_min = np.append(i_min, n_full + np.argmin(y[n_full:]))
+        i_max = np.append(i_max, n_full + np.argmax(y[n_full:]))
+
+    # keep the original order of the samples
+    index = np.empty(2 * i_min.size, dtype=np.intp)
+    index[0::2] = np.minimum(i_min, i_max)
+    index[1::2] = np.maximum(i_min, i_max)
+
+    return x[index], y[index]
+
+
+def decimate(
+    dataset: sdf.Dataset, n_bins: int = 1000, x_range: tuple[float, float] = None
+) -> sdf.Dataset:
+    """Decimate a 1-d Dataset to at most 2 * `n_bins` samples in `x_range`"""
+
+    y = np.asarray(dataset.data)
+    scale = dataset.scales[0] if dataset.scales else None
+    x = np.arange(y.size) if scale is None else np.asarray(scale.data)
+
+    start, stop = _bracket(x, x_range)
+    x, y = x[start:stop], y[start:stop]
+
+    return _decimated_dataset(dataset, scale, *min_max(x, y, n_bins))
+
+
+def _decimated_dataset(dataset, scale, x, y):
+    if scale is None:
+        ds_x = sdf.Dataset("index", data=x, is_scale=True)
+    else:
+        ds_x = sdf.Dataset(
+            scale.name,
+            comment=scale.comment,
+            data=x,
+            display_name=scale._display_name,
+            unit=scale.unit,
+            display_unit=scale._display_unit,
+            is_scale=True,
+        )
+
+    return sdf.Dataset(
+        dataset.name,
+        comment=dataset.comment,
+        attributes=dict(dataset.attributes),
+        data=y,
+        display_name=dataset._display_name,
+        relative_quantity=dataset.relative_quantity,
+        unit=dataset.unit,
+        display_unit=dataset._display_unit,
+        scales=[ds_x],
+    )
+
+
+def _write_levels(f: h5py.File, ds: sdf.Dataset, path: str, threshold: int) -> None:
+    """Write the decimated levels of a 1-d Dataset with a scale"""
+
+    x = np.asarray(ds.scales[0].data)
+    y = np.asarray(ds.data)
+    bin_size = factor
+    level = 1
+
+    while y.size > threshold:
+        # the min and max of a bin are among the min and max of its sub-bins
+        x, y = _min_max(x, y, bin_size if level == 1 else 2 * factor)
+        g = f.require_group(_levels_group + path + "/" + str(level))
+        g.attrs["BIN_SIZE"] = bin_size
+        g["x"] = x
+        g["y"] = y
+        bin_size *= factor
+        level += 1
+
+
+def load(
+    filename: str | PathLike,
+    objectname: str,
+    n_bins: int = 1000,
+    x_range: tuple[float, float] = None,
+) -> sdf.Dataset:
+    """Load a 1-d Dataset decimated to at most 2 * `n_bins` samples in `x_range`
+
+    The samples in `x_range` are found with a binary search on the scale.
+    Only the part of the coarsest stored level with enough samples in
+    `x_range` is read, or the part of the full dataset if no level is fine
+    enough.
+    """
+
+    filename = os.fspath(filename)
+
+    if filename.endswith(".mat"):
+        return decimate(sdf.load(filename, objectname), n_bins, x_range)
+
+    with h5py.File(filename, "r") as f:
+        dsobj = f[objectname]
+        levels = f.get(_levels_group + dsobj.name)
+
+        if levels is None or dsobj.ndim != 1 or not dsobj.dims[0]:
+            return decimate(hdf5._load(f, objectname), n_bins, x_range)
+
+        # read only the attributes of the dataset and scale
+        sobj = dsobj.dims[0][0]
+        dataset = sdf.Dataset(dsobj.name.split("/")[-1])
+        scale = sdf.Dataset(sobj.name.split("/")[-1])
+        hdf5._read_attributes(dsobj, dataset)
+        hdf5._read_attributes(sobj, scale)
+
+        # the samples in x_range (found with a binary search on the scale)
+        n = dsobj.shape[0]
+
+        if x_range is None:
+            start, stop = 0, n
+        else:
+            start = max(_searchsorted(sobj, x_range[0]) - 1, 0)
+            stop = min(_searchsorted(sobj, x_range[1], side="right") + 1, n)
+
+        # the coarsest level with enough samples (2 samples per bin)
+        for level in sorted(levels.keys(), key=int, reverse=True):
+            bin_size = int(levels[level].attrs["BIN_SIZE"])
+            size = levels[level]["y"].shape[0]
+            first = min(start // bin_size * 2, size)
+            last = min(-(-stop // bin_size) * 2, size)
+            if last - first >= 2 * n_bins:
+                x = levels[level]["x"][first:last]
+                y = levels[level]["y"][first:last]
+                return _decimated_dataset(dataset, scale, *min_max(x, y, n_bins))
+
+        # read the samples from the full dataset
+        x = sobj[start:stop]
+        y = dsobj[start:stop]
+
+        return _decimated_dataset(dataset, scale, *min_max(x, y, n_bins))
+
+
+def _searchsorted(x: h5py.Dataset, value: float, side: str = "left") -> int:
+    """np.searchsorted() for a 1-d h5py.Dataset that reads only O(log n) samples"""
+
+    lo, hi = 0, x.shape[0]
+
+    while lo < hi:
+        mid = (lo + hi) // 2
+        v = x[mid]
+        if v < value or (side == "right" and v == value):
+            lo = mid + 1
+        else:
+            hi = mid
+
+    return lo
+
+
+def _bracket(x, x_range):
+    """Get the indices of the samples in `x_range` including one neighbour on each side"""
+
+    if x_range is None:
+        return 0, x.size
+
+    start = max(int(np.searchsorted(x, x_range[0])) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_range[1], side="right")) + 1, x.size)
+
+    return start, stop
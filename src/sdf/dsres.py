@@ -1,8 +1,16 @@
+from __future__ import annotations
+
+import io
+import os
+import threading
+from collections import OrderedDict
 from os import PathLike
+from typing import IO
 
 import numpy as np
 from sdf import Group, Dataset
-import scipy.io
+
+from . import cache, profile
 
 
 # extract strings from the matrix
@@ -14,6 +22,469 @@ def strMatTrans(a):
     return ["".join(s).rstrip() for s in zip(*a)]
 
 
+# MAT v4 precision -> numpy type
+_mat4_types = {0: "f8", 1: "f4", 2: "i4", 3: "i2", 4: "u2", 5: "u1"}
+
+
+def _read_mat4_headers(
+    filename: str | PathLike | bytes, last: str = None
+) -> dict[str, tuple]:
+    """Read the headers of the matrices in a MAT v4 file
+
+    Returns a dict {name: (dtype, shape, offset)} where offset is the position
+    of the (column-major) data of the matrix in the file. The data of the last
+    matrix may be incomplete if the file is still being written. Stops after
+    the header of the matrix `last` if given. `filename` may also be the
+    content of the file.
+    """
+
+    headers = {}
+    offset = 0
+
+    if isinstance(filename, bytes):
+        size = len(filename)
+        f = io.BytesIO(filename)
+    else:
+        size = os.path.getsize(filename)
+        f = open(filename, "rb")
+
+    with f:
+        while offset + 20 <= size:
+            f.seek(offset)
+            header = np.frombuffer(f.read(20), dtype="<i4")
+
+            # the type is MOPT (machine, 0, precision, type)
+            if not 0 <= header[0] < 5000:
+                header = header.byteswap()
+
+            type_, mrows, ncols, imagf, namlen = (int(v) for v in header)
+
+            if not 0 <= type_ < 2000 or (type_ // 10) % 10 not in _mat4_types:
+                raise Exception("File structure not supported!")
+
+            byteorder = ">" if type_ // 1000 == 1 else "<"
+            dtype = np.dtype(byteorder + _mat4_types[(type_ // 10) % 10])
+            name = f.read(namlen).rstrip(b"\0").decode("ascii")
+
+            offset += 20 + namlen
+            headers[name] = (dtype, (mrows, ncols), offset)
+
+            if name == last:
+                break
+
+            offset += mrows * ncols * dtype.itemsize * (2 if imagf else 1)
+
+    return headers
+
+
+# maximum number of bytes of a matrix that are read at once
+_block_bytes = 64 * 2**20
+
+# maximum size of the trajectories that are kept by a catalogue
+_trajectory_bytes = 64 * 2**20
+
+
+def _read_mat4_matrix(
+    filename: str | PathLike | bytes, header: tuple, check: bool = True
+) -> np.ndarray | _Mat4Matrix:
+    """Get the (real) data of a matrix in a MAT v4 file (or its content)
+
+    The matrices of files are read when they are indexed (see _Mat4Matrix).
+    """
+
+    dtype, shape, offset = header
+
+    if shape[0] * shape[1] == 0:
+        return np.empty(shape, dtype=dtype)
+
+    if isinstance(filename, bytes):
+        return np.frombuffer(
+            filename, dtype=dtype, count=shape[0] * shape[1], offset=offset
+        ).reshape(shape, order="F")
+
+    return _Mat4Matrix(os.fspath(filename), dtype, shape, offset, check=check)
+
+
+class _Mat4Matrix:
+    """
+    A (column-major) matrix in a MAT v4 file that is read when it is indexed
+
+    Only the parts of the columns of the stored matrix that contain the indexed
+    elements are read. A slice of rows is read as one segment per column. Other
+    rows are selected from blocks of at most _block_bytes of whole columns, so
+    any number of rows is read in one pass. Unlike a memory map, reading from a
+    file that has been truncated or rewritten raises an exception instead of
+    crashing the interpreter. If `check` is False only truncated files are
+    detected (e.g. for files that are still being written).
+    """
+
+    def __init__(self, filename, dtype, shape, offset, transposed=False, check=True):
+        self.filename = filename
+        self.dtype = dtype
+        self._shape = shape
+        self._offset = offset
+        self._transposed = transposed
+        self._check = check
+
+        st = os.stat(filename)
+        self._stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self._shape[::-1] if self._transposed else self._shape
+
+    ndim = 2
+
+    @property
+    def nbytes(self) -> int:
+        return self._shape[0] * self._shape[1] * self.dtype.itemsize
+
+    @property
+    def T(self) -> _Mat4Matrix:
+        t = _Mat4Matrix.__new__(_Mat4Matrix)
+        t.__dict__.update(self.__dict__)
+        t._transposed = not self._transposed
+        return t
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[:, :], dtype=dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+
+        rows, cols = key
+
+        if self._transposed:
+            rows, cols = cols, rows
+
+        columns = np.arange(self._shape[1])[cols]
+        data = self._read(rows, np.atleast_1d(columns))
+
+        if np.ndim(columns) == 0:
+            data = data[..., 0]
+
+        return data.T if self._transposed else data
+
+    def _read(self, rows, columns):
+        """Read the rows (index or slice) of the columns of the stored matrix"""
+
+        m = self._shape[0]
+        itemsize = self.dtype.itemsize
+
+        if isinstance(rows, slice) and rows.step in {None, 1}:
+            # read the segment [start, stop) of every column
+            start, stop, _ = rows.indices(m)
+            stop = max(start, stop)
+            data = np.empty((stop - start, columns.size), dtype=self.dtype)
+
+            if data.size == 0:
+                return data
+
+            with self._open() as f:
+                for k, c in enumerate(columns.tolist()):
+                    data[:, k] = self._read_block(f, c * m + start, stop - start)
+
+            return data
+
+        # read blocks of whole columns and select the rows
+        shape = np.empty(m, dtype=np.int8)[rows].shape
+        data = np.empty(shape + (columns.size,), dtype=self.dtype)
+
+        if data.size == 0:
+            return data
+
+        order = np.argsort(columns, kind="stable")
+        sorted_ = columns[order]
+        step = max(1, _block_bytes // (m * itemsize))
+        i = 0
+
+        with self._open() as f:
+            while i < sorted_.size:
+                first = int(sorted_[i])
+                j = int(np.searchsorted(sorted_, first + step))
+                last = int(sorted_[j - 1])
+                n = last + 1 - first
+                block = self._read_block(f, first * m, n * m).reshape(n, m).T
+                data[..., order[i:j]] = block[rows][..., sorted_[i:j] - first]
+                i = j
+
+        return data
+
+    def _open(self):
+        f = open(self.filename, "rb")
+
+        try:
+            st = os.fstat(f.fileno())
+
+            if self._check and (st.st_ino, st.st_mtime_ns, st.st_size) != self._stat:
+                raise Exception("%s has been modified" % self.filename)
+        except BaseException:
+            f.close()
+            raise
+
+        return f
+
+    def _read_block(self, f, start, count):
+        """Read `count` elements of the stored matrix from element `start`"""
+
+        f.seek(self._offset + start * self.dtype.itemsize)
+        data = np.fromfile(f, dtype=self.dtype, count=count)
+
+        if data.size < count:
+            raise Exception("%s is incomplete" % self.filename)
+
+        profile.add(bytes_read=data.nbytes)
+
+        return data
+
+
+def _mat4_strings(a: np.ndarray) -> list[str]:
+    """Convert the rows of a MAT text matrix (8 or 16 bit characters) to strings"""
+
+    a = np.ascontiguousarray(a, dtype="<u4")
+
+    if a.shape[1] == 0:
+        return [""] * a.shape[0]
+
+    return [s.rstrip(" \0") for s in a.view("<U%d" % a.shape[1]).ravel().tolist()]
+
+
+def _open_mat4(
+    filename: str | PathLike | bytes, headers: dict[str, tuple] = None, check=True
+) -> tuple:
+    """Read the variable info of a Dymola result file
+
+    Returns (names, descriptions, d, x, data_1, data_2) where the rows of
+    data_1 and data_2 are the columns referenced by abs(x) - 1. The data is
+    read when data_1 and data_2 are indexed (see _Mat4Matrix).
+    """
+
+    if headers is None:
+        headers = _read_mat4_headers(filename)
+
+    def matrix(name):
+        try:
+            return _read_mat4_matrix(filename, headers[name], check)
+        except KeyError:
+            raise Exception("File structure not supported!")
+
+    fileInfo = _mat4_strings(matrix("Aclass"))
+
+    if len(fileInfo) < 4 or fileInfo[1] != "1.1":
+        raise Exception("File structure not supported!")
+
+    if fileInfo[3] == "binTrans":
+        names = _mat4_strings(matrix("name").T)
+        descr = _mat4_strings(matrix("description").T)
+        cons = matrix("data_1")
+        traj = matrix("data_2")
+        d = matrix("dataInfo")[0, :]
+        x = matrix("dataInfo")[1, :]
+    elif fileInfo[3] == "binNormal":
+        names = _mat4_strings(matrix("name"))
+        descr = _mat4_strings(matrix("description"))
+        cons = matrix("data_1").T
+        traj = matrix("data_2").T
+        d = matrix("dataInfo")[:, 0]
+        x = matrix("dataInfo")[:, 1]
+    else:
+        raise Exception("File structure not supported!")
+
+    return names, descr, np.asarray(d), np.asarray(x), cons, traj
+
+
+class Follower:
+    """
+    Follow the trajectories of a Dymola result file while it is being written
+
+    The variable info is read once and poll() reads only the rows of data_2
+    that have been completed since the last call. Requires a MAT v4 file in
+    the "binTrans" format (as written by Dymola during the simulation).
+
+    Parameters
+    ----------
+    filename : str
+        The Dymola result file.
+    objectnames : list[str]
+        The paths of the variables to follow (e.g. ["/Time", "/a/b/x"]).
+    """
+
+    def __init__(self, filename: str | PathLike, objectnames: list[str]):
+        self.filename = os.fspath(filename)
+        self.objectnames = list(objectnames)
+
+        headers = _read_mat4_headers(self.filename, last="data_2")
+
+        if "data_2" not in headers:
+            raise Exception("File structure not supported!")
+
+        dtype, shape, offset = headers["data_2"]
+
+        # read the variable info without data_2
+        headers["data_2"] = (dtype, (shape[0], 0), offset)
+        names, descr, d, x, cons, _ = _open_mat4(self.filename, headers, check=False)
+
+        fileInfo = _mat4_strings(
+            _read_mat4_matrix(self.filename, headers["Aclass"], check=False)
+        )
+
+        # the rows of a "binNormal" file cannot be appended
+        if fileInfo[3] != "binTrans":
+            raise Exception("File structure not supported!")
+
+        index = dict(zip(names, range(len(names))))
+        self._variables = []
+
+        for objectname in self.objectnames:
+            name = ".".join(s for s in objectname.split("/") if s)
+
+            if name not in index:
+                raise Exception('"%s" does not exist' % objectname)
+
+            i = index[name]
+            _, _, _, info = _split_description(descr[i])
+            c = abs(int(x[i])) - 1
+            s = int(np.sign(x[i]))
+            dtype_ = _data_type(info) or dtype
+            value = cons[c, 0] * s if d[i] == 1 else None
+            self._variables.append((c, s, dtype_, value))
+
+        self._dtype = dtype
+        self._row_size = shape[0] * dtype.itemsize
+        self._offset = offset
+        self.rows = 0
+
+    def poll(self) -> dict[str, np.ndarray]:
+        """Read the rows that have been appended since the last call
+
+        Returns a dict {objectname: values} with the new values of the
+        variables (constants are repeated for every row).
+        """
+
+        size = os.path.getsize(self.filename)
+        rows = max(0, (size - self._offset) // self._row_size) if self._row_size else 0
+        n = rows - self.rows
+
+        if n > 0:
+            with open(self.filename, "rb") as f:
+                f.seek(self._offset + self.rows * self._row_size)
+                buffer = f.read(n * self._row_size)
+            block = np.frombuffer(buffer, dtype=self._dtype).reshape(n, -1)
+            self.rows = rows
+        else:
+            block = np.empty((0, self._row_size // self._dtype.itemsize), self._dtype)
+
+        values = {}
+
+        for objectname, (c, s, dtype, value) in zip(self.objectnames, self._variables):
+            if value is None:
+                data = block[:, c] * s
+            else:
+                data = np.full(block.shape[0], value)
+            values[objectname] = data.astype(dtype, copy=False)
+
+        return values
+
+
+class _Mat73Matrix:
+    """
+    A matrix in a MAT v7.3 (HDF5) file that is read when it is indexed
+
+    The file is opened for every read, so no handle is kept open (e.g. by a
+    cached catalogue). The matrices are stored transposed (column-major).
+    """
+
+    def __init__(self, filename, name, dtype, shape, transposed=False):
+        self.filename = filename
+        self.name = name
+        self.dtype = dtype
+        self._shape = shape
+        self._transposed = transposed
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self._shape[::-1] if self._transposed else self._shape
+
+    ndim = 2
+
+    @property
+    def T(self) -> _Mat73Matrix:
+        return _Mat73Matrix(
+            self.filename, self.name, self.dtype, self._shape, not self._transposed
+        )
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[:, :], dtype=dtype)
+
+    def __getitem__(self, key):
+        import h5py
+
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+
+        if self._transposed:
+            key = key[::-1]
+
+        with h5py.File(self.filename, "r") as f:
+            data = f[self.name][key]
+
+        return data.T if self._transposed else data
+
+
+def _open_mat73(filename: str | PathLike | bytes) -> tuple:
+    """Read the variable info of a MAT v7.3 (HDF5) Dymola result file
+
+    Returns (names, descriptions, d, x, data_1, data_2) (see _open_mat4())
+    where data_2 is read from the file when a trajectory is accessed. The
+    matrices are stored transposed (column-major) in the HDF5 file.
+    """
+
+    import h5py
+
+    if isinstance(filename, bytes):
+        filename = io.BytesIO(filename)
+
+    with h5py.File(filename, "r") as f:
+
+        def matrix(name):
+            try:
+                return f[name][()]
+            except KeyError:
+                raise Exception("File structure not supported!")
+
+        fileInfo = _mat4_strings(matrix("Aclass").T)
+
+        if len(fileInfo) < 4 or fileInfo[1] != "1.1":
+            raise Exception("File structure not supported!")
+
+        if "data_2" not in f:
+            raise Exception("File structure not supported!")
+
+        # the HDF5 dataset is the transposed matrix
+        dsobj = f["data_2"]
+        data_2 = _Mat73Matrix(filename, "data_2", dsobj.dtype, dsobj.shape)
+
+        if fileInfo[3] == "binTrans":
+            names = _mat4_strings(matrix("name"))
+            descr = _mat4_strings(matrix("description"))
+            cons = matrix("data_1").T
+            traj = data_2.T
+            dataInfo = matrix("dataInfo")
+            d, x = dataInfo[:, 0], dataInfo[:, 1]
+        elif fileInfo[3] == "binNormal":
+            names = _mat4_strings(matrix("name").T)
+            descr = _mat4_strings(matrix("description").T)
+            cons = matrix("data_1")
+            traj = data_2
+            dataInfo = matrix("dataInfo")
+            d, x = dataInfo[0, :], dataInfo[1, :]
+        else:
+            raise Exception("File structure not supported!")
+
+    return names, descr, d, x, cons, traj
+
+
 def _split_description(
     comment: str,
 ) -> tuple[str | None, str | None, str | None, dict[str, str]]:
@@ -40,133 +511,475 @@ def _split_description(
     return unit, display_unit, comment, info
 
 
-def load(filename: str | PathLike, objectname: str) -> Dataset | Group:
-    g_root = _load_mat(filename)
+def _data_type(info: dict[str, str]) -> type | None:
+    """Get the data type for the type info of a variable"""
+
+    if info.get("type") == "Integer":
+        return np.int32
+    elif info.get("type") == "Boolean":
+        return np.bool_
+
+    return None
 
-    if objectname == "/":
-        return g_root
-    else:
-        obj = g_root
-        segments = objectname.split("/")
-        for s in segments:
-            if s:
-                obj = obj[s]
-        return obj
+
+def load(filename: str | PathLike | IO[bytes], objectname: str) -> Dataset | Group:
+    with profile.call("dsres.load", filename, objectname):
+        if hasattr(filename, "read"):
+            # read the content of a file-like object (not cached)
+            return Catalog(*_read_mat(filename.read())).get(objectname)
+
+        return _catalog(filename).get(objectname)
+
+
+def _catalog(filename: str | PathLike) -> "Catalog":
+    return cache.cached(
+        filename,
+        "/",
+        lambda: Catalog(*_read_mat(filename)),
+        enable=cache.enabled or cache.catalogs,
+    )
+
+
+def _walk(filename: str | PathLike):
+    """Yield (path, unit, ndim, has_scale) of the variables of a Dymola result"""
+
+    catalog = _catalog(filename)
+    has_time = catalog._time_index is not None
+
+    for name, d, unit in zip(catalog.names, catalog.d, catalog.unit.tolist()):
+        yield (
+            "/" + name.replace(".", "/"),
+            catalog._string(unit),
+            0 if d == 1 else 1,
+            has_time and d != 0 and d != 1,
+        )
 
 
 def _load_mat(filename: str) -> Group:
-    mat = scipy.io.loadmat(filename, chars_as_strings=False)
+    return Catalog(*_read_mat(filename)).root
+
+
+def _read_mat(filename: str | bytes) -> tuple:
+    """Read the variable info and data of a Dymola result file (or its content)
+
+    Returns (names, descriptions, d, x, data_1, data_2) (see _open_mat4())
+    """
+
+    if isinstance(filename, bytes):
+        header = filename[:10]
+    else:
+        with open(filename, "rb") as f:
+            header = f.read(10)
 
-    _vars = {}
-    _blocks = []
+    if not header.startswith(b"MATLAB"):
+        # the data of MAT v4 files is read on demand
+        return _open_mat4(filename)
+
+    if header == b"MATLAB 7.3":
+        # MAT v7.3 files are HDF5 files with a 512 byte user block
+        return _open_mat73(filename)
+
+    import scipy.io
+
+    if isinstance(filename, bytes):
+        filename = io.BytesIO(filename)
+
+    mat = scipy.io.loadmat(filename, chars_as_strings=False)
 
     try:
         fileInfo = strMatNormal(mat["Aclass"])
     except KeyError:
         raise Exception("File structure not supported!")
 
-    if fileInfo[1] == "1.1":
-        if fileInfo[3] == "binTrans":
-            # usually files from OpenModelica or Dymola auto saved,
-            # all methods rely on this structure since this was the only
-            # one understand by earlier versions
-            names = strMatTrans(mat["name"])  # names
-            descr = strMatTrans(mat["description"])  # descriptions
+    if fileInfo[1] != "1.1":
+        raise Exception("File structure not supported!")
 
-            cons = mat["data_1"]
-            traj = mat["data_2"]
+    if fileInfo[3] == "binTrans":
+        # usually files from OpenModelica or Dymola auto saved,
+        # all methods rely on this structure since this was the only
+        # one understand by earlier versions
+        names = strMatTrans(mat["name"])  # names
+        descr = strMatTrans(mat["description"])  # descriptions
 
-            d = mat["dataInfo"][0, :]
-            x = mat["dataInfo"][1, :]
+        cons = mat["data_1"]
+        traj = mat["data_2"]
 
-        elif fileInfo[3] == "binNormal":
-            # usually files from dymola, save as...,
-            # variables are mapped to the structure above ('binTrans')
-            names = strMatNormal(mat["name"])  # names
-            descr = strMatNormal(mat["description"])  # descriptions
+        d = mat["dataInfo"][0, :]
+        x = mat["dataInfo"][1, :]
 
-            cons = mat["data_1"].T
-            traj = mat["data_2"].T
+    elif fileInfo[3] == "binNormal":
+        # usually files from dymola, save as...,
+        # variables are mapped to the structure above ('binTrans')
+        names = strMatNormal(mat["name"])  # names
+        descr = strMatNormal(mat["description"])  # descriptions
 
-            d = mat["dataInfo"][:, 0]
-            x = mat["dataInfo"][:, 1]
-        else:
-            raise Exception("File structure not supported!")
+        cons = mat["data_1"].T
+        traj = mat["data_2"].T
 
-        c = np.abs(x) - 1  # column
-        s = np.sign(x)  # sign
-
-        vars = zip(names, descr, d, c, s)
-    elif fileInfo[1] == "1.0":
-        # files generated with dymola, save as..., only plotted ...
-        # fake the structure of a 1.1 transposed file
-        names = strMatNormal(mat["names"])  # names
-        _blocks.append(0)
-        mat["data_0"] = mat["data"].transpose()
-        del mat["data"]
-        _absc = (names[0], "")
-        for i in range(1, len(names)):
-            _vars[names[i]] = ("", 0, i, 1)
+        d = mat["dataInfo"][:, 0]
+        x = mat["dataInfo"][:, 1]
     else:
         raise Exception("File structure not supported!")
 
-    # build the SDF tree
-    g_root = Group("/")
+    return names, descr, d, x, cons, traj
+
+
+class Catalog:
+    """
+    A compact catalogue of the variables in a Dymola result
+
+    The variables and groups are stored as arrays (struct-of-arrays) and the
+    units, display units, comments and types as indices into a list of unique
+    strings. The sdf.Group and sdf.Dataset objects are created when they are
+    accessed and the data of a Dataset is read when it is accessed. The
+    catalogue does not keep references to the objects it has created.
+
+    The trajectories that have been read are kept (up to _trajectory_bytes).
+    In the "binTrans" layout a trajectory is spread over the whole of data_2,
+    so a read fills the trajectories of as many variables as fit into the
+    budget in the same pass.
+    """
+
+    def __init__(self, names, descr, d, x, cons, traj):
+        strings = {}
+        parsed = {}
+        groups = {"": 0}
+
+        self.names = names
+        self.group_names = ["/"]
+        group_parent = [-1]
+
+        n = len(names)
+        self.parent = np.empty(n, dtype=np.int32)
+        self.unit = np.empty(n, dtype=np.int32)
+        self.display_unit = np.empty(n, dtype=np.int32)
+        self.comment = np.empty(n, dtype=np.int32)
+        self.type = np.empty(n, dtype=np.int32)
+        self.d = np.asarray(d, dtype=np.int8)
+        self.column = np.abs(np.asarray(x, dtype=np.int32)) - 1
+        self.sign = np.sign(np.asarray(x)).astype(np.int8)
+        self.cons = cons
+        self.traj = traj
+
+        # the first row of data_1 (read on the first access)
+        self._cons = None
+
+        # column -> trajectory (read-only)
+        self._trajectories = OrderedDict()
+        self._trajectories_nbytes = 0
+        self._lock = threading.Lock()
+
+        def intern(value):
+            return -1 if value is None else strings.setdefault(value, len(strings))
+
+        for i, (name, desc) in enumerate(zip(names, descr)):
+            # descriptions are often repeated
+            if desc not in parsed:
+                unit, display_unit, comment, info = _split_description(desc)
+                parsed[desc] = (
+                    intern(unit),
+                    intern(display_unit),
+                    intern(comment),
+                    intern(info.get("type")),
+                )
+
+            self.unit[i], self.display_unit[i], self.comment[i], self.type[i] = parsed[
+                desc
+            ]
+
+            parent = 0
+            prefix = ""
+
+            for segment in name.split(".")[:-1]:
+                prefix += segment + "."
+                if prefix not in groups:
+                    groups[prefix] = len(self.group_names)
+                    self.group_names.append(segment)
+                    group_parent.append(parent)
+                parent = groups[prefix]
+
+            self.parent[i] = parent
+
+        self.strings = list(strings)
+        self.group_parent = np.asarray(group_parent, dtype=np.int32)
+
+        # the time is the abscissa of the trajectories
+        time = np.flatnonzero(self.d == 0)
+        self._time_index = time[0] if time.size > 0 else None
+
+        # children of group i are [start[i], start[i + 1]) in order
+        ngroups = len(self.group_names)
+        self._var_order = np.argsort(self.parent, kind="stable")
+        self._var_start = np.searchsorted(
+            self.parent[self._var_order], np.arange(ngroups + 1)
+        )
+        self._group_order = np.argsort(self.group_parent, kind="stable")
+        self._group_start = np.searchsorted(
+            self.group_parent[self._group_order], np.arange(ngroups + 1)
+        )
+
+        # group path -> index and variable name -> index (created on demand)
+        self._group_index = groups
+        self._name_index = None
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the catalogue arrays and the trajectories it may keep"""
+
+        traj_nbytes = int(np.prod(self.traj.shape)) * self.traj.dtype.itemsize
+
+        return min(_trajectory_bytes, traj_nbytes) + sum(
+            a.nbytes
+            for a in [
+                self.parent,
+                self.unit,
+                self.display_unit,
+                self.comment,
+                self.type,
+                self.d,
+                self.column,
+                self.sign,
+                self.group_parent,
+            ]
+        )
+
+    @property
+    def root(self) -> Group:
+        return self.group(0)
+
+    def _string(self, index):
+        return None if index < 0 else self.strings[index]
+
+    def group(self, index: int, time: Dataset = None) -> Group:
+        """Get a Group view of a group (its children are created on access)
+
+        `time` is the scale of the trajectories (created if None).
+        """
+
+        return _CatalogGroup(self, index, time)
+
+    def child_groups(self, index: int) -> np.ndarray:
+        """Get the indices of the child groups of a group"""
+
+        start, stop = self._group_start[index : index + 2]
+        return self._group_order[start:stop]
+
+    def child_datasets(self, index: int) -> np.ndarray:
+        """Get the indices of the variables in a group"""
+
+        start, stop = self._var_start[index : index + 2]
+        return self._var_order[start:stop]
+
+    def dataset(self, index: int, time: Dataset = None) -> Dataset:
+        """Get the Dataset of a variable (the data is read on the first access)
+
+        `time` is the scale of trajectories (created if None).
+        """
+
+        d = self.d[index]
+
+        ds = _CatalogDataset(
+            self,
+            index,
+            name=self.names[index].split(".")[-1],
+            comment="Simulation time" if d == 0 else self._string(self.comment[index]),
+            unit=self._string(self.unit[index]),
+            display_unit=self._string(self.display_unit[index]),
+        )
 
-    ds_time = None
+        if d != 0 and d != 1 and self._time_index is not None:
+            ds.scales = [self.dataset(self._time_index) if time is None else time]
 
-    for name, desc, d, c, s in vars:
-        unit, display_unit, comment, info = _split_description(desc)
+        return ds
+
+    def data(self, index: int) -> np.ndarray:
+        """Read the data of a variable"""
 
-        path = name.split(".")
-
-        g_parent = g_root
-
-        for segment in path[:-1]:
-            if segment in g_parent:
-                g_parent = g_parent[segment]
-            else:
-                g_child = Group(segment)
-                g_parent.groups.append(g_child)
-                g_parent = g_child
-            pass
+        d = self.d[index]
+        c = self.column[index]
+        s = self.sign[index]
 
         if d == 1:
-            data = cons[c, 0] * s
+            data = np.multiply(self._constants()[c], s, dtype=self.cons.dtype)
         else:
-            data = traj[c, :] * s
-
-        if "type" in info:
-            if info["type"] == "Integer" or "Boolean":
-                data = np.asarray(data, dtype=np.int32)
-
-        if d == 0:
-            ds = Dataset(
-                path[-1],
-                comment="Simulation time",
-                unit=unit,
-                display_unit=display_unit,
-                data=data,
-            )
-            ds_time = ds
-        elif d == 1:
-            ds = Dataset(
-                path[-1],
-                comment=comment,
-                unit=unit,
-                display_unit=display_unit,
-                data=data,
-            )
-        else:
-            ds = Dataset(
-                path[-1],
-                comment=comment,
-                unit=unit,
-                display_unit=display_unit,
-                data=data,
-                scales=[ds_time],
-            )
-
-        g_parent.datasets.append(ds)
-
-    return g_root
+            data = np.multiply(self._trajectory(c), s, dtype=self.traj.dtype)
+
+        type_ = self._string(self.type[index])
+        dtype = _data_type({} if type_ is None else {"type": type_})
+
+        if dtype is not None:
+            data = np.asarray(data, dtype=dtype)
+
+        profile.add(arrays=1)
+
+        return data
+
+    def _constants(self) -> np.ndarray:
+        """Get the values of the constants (data_1 is read once)"""
+
+        with self._lock:
+            if self._cons is None:
+                self._cons = np.asarray(self.cons[:, 0])
+
+            return self._cons
+
+    def _trajectory(self, column: int) -> np.ndarray:
+        """Get the trajectory of a column of data_2 (read and kept if necessary)"""
+
+        with self._lock:
+            if column in self._trajectories:
+                self._trajectories.move_to_end(column)
+                return self._trajectories[column]
+
+            columns = self._prefetch(column)
+
+            # the indices must be increasing for h5py
+            values = np.asarray(self.traj[np.asarray(columns), :])
+            values.flags.writeable = False
+
+            for c, trajectory in zip(columns, values):
+                self._trajectories[c] = trajectory
+                self._trajectories_nbytes += trajectory.nbytes
+
+            trajectory = self._trajectories[column]
+
+            while self._trajectories_nbytes > _trajectory_bytes and self._trajectories:
+                _, t = self._trajectories.popitem(last=False)
+                self._trajectories_nbytes -= t.nbytes
+
+            return trajectory
+
+    def _prefetch(self, column: int) -> list[int]:
+        """Get the (sorted) columns to read together with `column`"""
+
+        # only the "binTrans" layout of MAT v4 files has to read all of data_2
+        if not isinstance(self.traj, _Mat4Matrix) or self.traj._transposed:
+            return [column]
+
+        row_bytes = max(1, self.traj.shape[1] * self.traj.dtype.itemsize)
+        n = max(1, _trajectory_bytes // row_bytes)
+
+        candidates = np.unique(self.column[self.d != 1])
+        candidates = [int(c) for c in candidates if c not in self._trajectories]
+
+        # the columns that follow `column` (e.g. the variables of the same group)
+        k = candidates.index(column) if column in candidates else 0
+        columns = (candidates[k:] + candidates[:k])[:n]
+
+        return sorted(columns)
+
+    def get(self, objectname: str) -> Dataset | Group | None:
+        """Get a Dataset or Group by its path (e.g. "/a/b/x")"""
+
+        name = ".".join(s for s in objectname.split("/") if s)
+
+        if not name:
+            return self.root
+
+        if self._name_index is None:
+            self._name_index = dict(zip(self.names, range(len(self.names))))
+
+        if name in self._name_index:
+            return self.dataset(self._name_index[name])
+
+        if name + "." in self._group_index:
+            return self.group(self._group_index[name + "."])
+
+        return None
+
+
+# the slots of sdf.Group and sdf.Dataset
+_group_groups = Group.groups
+_group_datasets = Group.datasets
+_dataset_data = Dataset.data
+
+
+class _CatalogGroup(Group):
+    """A Group of a Catalog that creates its children on the first access"""
+
+    __slots__ = ("_catalog", "_index", "_time", "_loaded")
+
+    def __init__(self, catalog: Catalog, index: int, time: Dataset = None):
+        self._catalog = catalog
+        self._index = index
+        self._time = time
+        self._loaded = False
+        super().__init__(name=catalog.group_names[index])
+
+    def _load(self):
+        if self._loaded:
+            return
+
+        self._loaded = True
+        catalog = self._catalog
+        time_index = catalog._time_index
+
+        # the children share the scale
+        if self._time is None and time_index is not None:
+            self._time = catalog.dataset(time_index)
+
+        _group_groups.__set__(
+            self,
+            [catalog.group(i, self._time) for i in catalog.child_groups(self._index)],
+        )
+        _group_datasets.__set__(
+            self,
+            [
+                self._time if i == time_index else catalog.dataset(i, self._time)
+                for i in catalog.child_datasets(self._index)
+            ],
+        )
+
+    @property
+    def groups(self):
+        self._load()
+        return _group_groups.__get__(self)
+
+    @groups.setter
+    def groups(self, value):
+        _group_groups.__set__(self, value)
+
+    @property
+    def datasets(self):
+        self._load()
+        return _group_datasets.__get__(self)
+
+    @datasets.setter
+    def datasets(self, value):
+        _group_datasets.__set__(self, value)
+
+    def __repr__(self):
+        if self._loaded:
+            return super().__repr__()
+
+        return "Group(name=%r, <not loaded>)" % self.name
+
+
+class _CatalogDataset(Dataset):
+    """A Dataset of a Catalog that reads its data on the first access"""
+
+    __slots__ = ("_catalog", "_index", "_loaded")
+
+    def __init__(self, catalog: Catalog, index: int, **kwargs):
+        self._catalog = catalog
+        self._index = index
+        super().__init__(**kwargs)
+        self._loaded = False
+
+    @property
+    def data(self):
+        if not self._loaded:
+            self.data = self._catalog.data(self._index)
+
+        return _dataset_data.__get__(self)
+
+    @data.setter
+    def data(self, value):
+        _dataset_data.__set__(self, value)
+        self._loaded = True
+
+    def __repr__(self):
+        if self._loaded:
+            return super().__repr__()
+
+        return "Dataset(name=%r, unit=%r, <not loaded>)" % (self.name, self.unit)
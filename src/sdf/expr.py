@@ -0,0 +1,589 @@
+"""
+Lazy, unit-aware expressions of datasets
+
+load() returns a lazy reference to a dataset in an SDF file. Arithmetic on the
+references builds an expression graph that is evaluated block by block (on a
+thread pool if `parallel` is True), so derived signals can be computed for
+files that do not fit into memory:
+
+    u = sdf.expr.load("results.sdf", "/u")  # [V]
+    i = sdf.expr.load("results.sdf", "/i")  # [A]
+
+    p = (u * i).with_unit("W").to("kW")
+
+    p.save("results.sdf", "/p")
+
+Operands of + and - are converted to the unit of the left operand with
+convert_unit(). The units of products, quotients and powers are derived from
+the units of the operands. The result inherits the scales of the operands,
+which must be the same datasets or have the same values (ValueError).
+"""
+
+from __future__ import annotations
+
+import abc
+import os
+from os import PathLike
+
+import h5py
+import numpy as np
+from attrs import define, field
+
+import sdf
+from . import chunks, profile
+from .hdf5 import _create_dataset, _scale_attributes, _str, _to_python_str
+from .units import convert_unit
+
+
+@define(eq=False)
+class Expression(abc.ABC):
+    """A lazy expression of datasets"""
+
+    unit: str = None
+    shape: tuple[int, ...] = ()
+
+    # the scales of the dimensions (Source or None)
+    scales: list = field(factory=list)
+
+    @abc.abstractmethod
+    def _evaluate(self, files, start, stop):
+        """Evaluate the rows [start, stop)"""
+
+    def _sources(self):
+        """Yield the Sources of the expression"""
+
+        return ()
+
+    def __add__(self, other):
+        return _sum(np.add, self, other)
+
+    def __radd__(self, other):
+        return _sum(np.add, other, self)
+
+    def __sub__(self, other):
+        return _sum(np.subtract, self, other)
+
+    def __rsub__(self, other):
+        return _sum(np.subtract, other, self)
+
+    def __mul__(self, other):
+        return _product(np.multiply, self, other)
+
+    def __rmul__(self, other):
+        return _product(np.multiply, other, self)
+
+    def __truediv__(self, other):
+        return _product(np.true_divide, self, other)
+
+    def __rtruediv__(self, other):
+        return _product(np.true_divide, other, self)
+
+    def __pow__(self, exponent):
+        if isinstance(exponent, Expression):
+            raise Exception("The exponent must be a number")
+
+        return self.apply(
+            lambda x: np.power(x, exponent), unit=_power_unit(self.unit, exponent)
+        )
+
+    def __neg__(self):
+        return self.apply(np.negative, unit=self.unit)
+
+    def __abs__(self):
+        return self.apply(np.abs, unit=self.unit)
+
+    def to(self, unit: str) -> Expression:
+        """Convert the values to `unit`"""
+
+        from_unit = self.unit
+
+        if (from_unit or "") == (unit or ""):
+            return self
+
+        _check_conversion(from_unit, unit)
+
+        return self.apply(lambda x: convert_unit(x, from_unit, unit), unit=unit)
+
+    def with_unit(self, unit: str) -> Expression:
+        """Set the unit without changing the values (e.g. "V*A" -> "W")"""
+
+        return self.apply(lambda x: x, unit=unit)
+
+    def apply(self, func, unit: str = None) -> Expression:
+        """Apply an element-wise function (e.g. np.sqrt) to the values"""
+
+        return apply(func, self, unit=unit)
+
+    def evaluate(self, block_rows: int = None, parallel: bool = True) -> sdf.Dataset:
+        """Evaluate the expression to an sdf.Dataset in memory"""
+
+        if not self.shape:
+            raise Exception("The expression does not depend on a dataset")
+
+        files = _open(self)
+
+        try:
+            dtype = self._evaluate(files, 0, 0).dtype
+            data = np.empty(self.shape, dtype=dtype)
+            rows = block_rows or chunks.chunk_shape(self.shape, dtype.itemsize)[0]
+
+            def compute(start):
+                return start, self._evaluate(files, start, start + rows)
+
+            starts = range(0, self.shape[0], rows)
+
+            for start, block in chunks._map(compute, starts, parallel):
+                data[start : start + rows] = block
+
+            scales = []
+
+            for scale in self.scales:
+                if scale is None:
+                    scales.append(None)
+                else:
+                    s = _create_dataset(files[scale.filename][scale.objectname], {})
+                    s.is_scale = True
+                    scales.append(s)
+        finally:
+            _close(files)
+
+        return sdf.Dataset(unit=self.unit, data=data, scales=scales)
+
+    def save(
+        self,
+        filename: str | PathLike,
+        objectname: str,
+        comment: str = None,
+        display_name: str = None,
+        compression_level: int | None = 4,
+        block_rows: int = None,
+        parallel: bool = True,
+    ) -> Source:
+        """Evaluate the expression and write it to a new dataset (see save())"""
+
+        return save(
+            self,
+            filename,
+            objectname,
+            comment=comment,
+            display_name=display_name,
+            compression_level=compression_level,
+            block_rows=block_rows,
+            parallel=parallel,
+        )
+
+
+@define(eq=False)
+class Source(Expression):
+    """A dataset in an HDF5 SDF file"""
+
+    filename: str = None
+    objectname: str = None
+
+    def _evaluate(self, files, start, stop):
+        return files[self.filename][self.objectname][start:stop]
+
+    def _sources(self):
+        yield self
+
+
+@define(eq=False)
+class Constant(Expression):
+    """A scalar value"""
+
+    value: np.ndarray = None
+
+    def _evaluate(self, files, start, stop):
+        return self.value
+
+
+@define(eq=False)
+class Operation(Expression):
+    """An element-wise function of the operands"""
+
+    func: object = None
+    operands: list[Expression] = field(factory=list)
+
+    def _evaluate(self, files, start, stop):
+        return self.func(*[o._evaluate(files, start, stop) for o in self.operands])
+
+    def _sources(self):
+        for operand in self.operands:
+            yield from operand._sources()
+
+
+def load(filename: str | PathLike, objectname: str) -> Source:
+    """Get a lazy reference to a dataset in an SDF file (HDF5)"""
+
+    filename = os.path.abspath(os.fspath(filename))
+
+    with h5py.File(filename, "r") as f:
+        dsobj = f.get(objectname)
+
+        if not isinstance(dsobj, h5py.Dataset):
+            raise Exception("'%s' is not a dataset" % objectname)
+
+        if dsobj.ndim == 0:
+            raise Exception("'%s' is a scalar" % objectname)
+
+        scales = []
+
+        for dim in dsobj.dims:
+            if len(dim) == 0 or dim[0] == dsobj:
+                scales.append(None)
+            else:
+                sobj = dim[0]
+                scales.append(
+                    Source(
+                        unit=_unit(sobj),
+                        shape=sobj.shape,
+                        filename=filename,
+                        objectname=sobj.name,
+                    )
+                )
+
+        return Source(
+            unit=_unit(dsobj),
+            shape=dsobj.shape,
+            scales=scales,
+            filename=filename,
+            objectname=dsobj.name,
+        )
+
+
+def _unit(dsobj):
+    unit = dsobj.attrs.get("UNIT")
+    return None if unit is None else _to_python_str(unit)
+
+
+def apply(func, *operands, unit: str = None) -> Expression:
+    """Apply an element-wise function to the operands (e.g. np.arctan2)"""
+
+    operands = [_operand(o) for o in operands]
+    shape, scales = (), []
+
+    for operand in operands:
+        shape, scales = _broadcast(shape, scales, operand)
+
+    return Operation(
+        unit=unit, shape=shape, scales=scales, func=func, operands=operands
+    )
+
+
+def save(
+    expression: Expression,
+    filename: str | PathLike,
+    objectname: str,
+    comment: str = None,
+    display_name: str = None,
+    compression_level: int | None = 4,
+    block_rows: int = None,
+    parallel: bool = True,
+) -> Source:
+    """Evaluate an expression and write it to a new dataset
+
+    The expression is evaluated and compressed in blocks of `block_rows` rows
+    (by default about chunks.chunk_bytes) that are written directly to the
+    chunks of the dataset. The scales of the expression are attached and copied
+    to `filename` if they are in other files.
+
+    Parameters
+    ----------
+    expression : Expression
+        The expression to evaluate.
+    filename : str
+        The SDF file to write to (created if it does not exist).
+    objectname : str
+        The path of the new dataset (e.g. "/p").
+    comment : str, optional
+        The comment of the dataset.
+    display_name : str, optional
+        The display name of the dataset.
+    compression_level : int, optional
+        The gzip compression level (0-9) or None to write uncompressed chunks.
+    block_rows : int, optional
+        The number of rows that are evaluated at once (the chunk size).
+    parallel : bool, optional
+        If True the blocks are evaluated and compressed on a thread pool.
+
+    Returns
+    -------
+    source : Source
+        A lazy reference to the new dataset.
+    """
+
+    if not expression.shape:
+        raise Exception("The expression does not depend on a dataset")
+
+    filename = os.path.abspath(os.fspath(filename))
+
+    with profile.call("expr.save", filename, objectname), h5py.File(filename, "a") as f:
+        if objectname in f:
+            raise Exception("'%s' already exists in %s" % (objectname, filename))
+
+        files = _open(expression, {filename: f})
+
+        try:
+            # check the scales before anything is written
+            for scale in expression.scales:
+                if (
+                    scale is not None
+                    and scale.filename != filename
+                    and scale.objectname in f
+                    and not _equal(
+                        f[scale.objectname], files[scale.filename][scale.objectname]
+                    )
+                ):
+                    raise Exception(
+                        "The scale '%s' already exists in %s with different values"
+                        % (scale.objectname, filename)
+                    )
+
+            dsobj = _write(
+                f,
+                files,
+                expression,
+                objectname,
+                compression_level,
+                block_rows,
+                parallel,
+            )
+
+            if comment:
+                dsobj.attrs["COMMENT"] = _str(comment)
+
+            if display_name:
+                dsobj.attrs["NAME"] = _str(display_name)
+
+            if expression.unit:
+                dsobj.attrs["UNIT"] = _str(expression.unit)
+
+            for i, scale in enumerate(expression.scales):
+                if scale is None:
+                    continue
+
+                if scale.filename == filename or scale.objectname in f:
+                    # the scale is in the file or has been copied (see above)
+                    sobj = f[scale.objectname]
+                else:
+                    # copy the scale
+                    sobj = _write(
+                        f,
+                        files,
+                        scale,
+                        scale.objectname,
+                        compression_level,
+                        block_rows,
+                        parallel,
+                    )
+
+                    src = files[scale.filename][scale.objectname]
+
+                    for name, value in src.attrs.items():
+                        if name not in _scale_attributes:
+                            sobj.attrs[name] = value
+
+                if not sobj.is_scale:
+                    h5py.h5ds.set_scale(
+                        sobj.id, _str(_to_python_str(sobj.attrs.get("NAME", b"")))
+                    )
+
+                dsobj.dims[i].attach_scale(sobj)
+        finally:
+            _close(files, keep=f)
+
+    return load(filename, objectname)
+
+
+def _write(f, files, expression, objectname, compression_level, block_rows, parallel):
+    """Evaluate an expression block by block to a new chunked dataset"""
+
+    shape = expression.shape
+    dtype = np.asarray(expression._evaluate(files, 0, 0)).dtype
+
+    parent = objectname.rsplit("/", 1)[0]
+
+    if parent:
+        f.require_group(parent)
+
+    if 0 in shape:
+        return f.create_dataset(objectname, shape=shape, dtype=dtype)
+
+    rows = block_rows or chunks.chunk_shape(shape, dtype.itemsize)[0]
+    chunk = (min(rows, shape[0]),) + shape[1:]
+    shuffle = dtype.itemsize > 1
+
+    if compression_level is None:
+        compression = {}
+    else:
+        compression = dict(
+            compression="gzip", compression_opts=compression_level, shuffle=shuffle
+        )
+
+    dsobj = f.create_dataset(
+        objectname, shape=shape, dtype=dtype, chunks=chunk, **compression
+    )
+
+    chunks.write_blocks(
+        dsobj,
+        lambda start, stop: expression._evaluate(files, start, stop),
+        compression_level,
+        shuffle,
+        parallel,
+    )
+
+    profile.add(bytes_written=int(np.prod(shape)) * dtype.itemsize, objects=1)
+
+    return dsobj
+
+
+def _equal(a, b):
+    """Compare the values of two datasets in blocks of rows"""
+
+    if a.shape != b.shape:
+        return False
+
+    if a.ndim == 0 or a.shape[0] == 0:
+        return np.array_equal(a[()], b[()])
+
+    rows = chunks.chunk_shape(a.shape, max(a.dtype.itemsize, b.dtype.itemsize))[0]
+
+    return all(
+        np.array_equal(a[start : start + rows], b[start : start + rows])
+        for start in range(0, a.shape[0], rows)
+    )
+
+
+def _open(expression, files=None):
+    """Open the files of the Sources (and their scales) of an expression"""
+
+    files = dict(files or {})
+
+    for source in expression._sources():
+        for s in [source] + [s for s in source.scales if s is not None]:
+            if s.filename not in files:
+                files[s.filename] = h5py.File(s.filename, "r")
+
+    for s in expression.scales:
+        if s is not None and s.filename not in files:
+            files[s.filename] = h5py.File(s.filename, "r")
+
+    return files
+
+
+def _close(files, keep=None):
+    for f in files.values():
+        if f is not keep:
+            f.close()
+
+
+def _operand(value):
+    if isinstance(value, Expression):
+        return value
+
+    value = np.asarray(value)
+
+    if value.ndim != 0:
+        raise Exception("Operands must be expressions or scalars")
+
+    return Constant(value=value)
+
+
+def _broadcast(shape, scales, operand):
+    """Get the shape and scales of an operation with `operand`"""
+
+    if not operand.shape:
+        return shape, scales
+
+    if not shape:
+        return operand.shape, list(operand.scales)
+
+    if operand.shape != shape:
+        raise Exception(
+            "The shapes of the operands %s and %s do not match" % (shape, operand.shape)
+        )
+
+    for s, o in zip(scales, operand.scales):
+        if not _same_scale(s, o):
+            raise ValueError(
+                "The scales %s and %s of the operands are different"
+                % (s.objectname, o.objectname)
+            )
+
+    return shape, [s if s is not None else o for s, o in zip(scales, operand.scales)]
+
+
+def _same_scale(a, b):
+    """Check if two scales are the same dataset or have the same values"""
+
+    if a is None or b is None:
+        return True
+
+    if (a.filename, a.objectname) == (b.filename, b.objectname):
+        return True
+
+    if a.shape != b.shape:
+        return False
+
+    files = _open(Operation(operands=[a, b]))
+
+    try:
+        return _equal(files[a.filename][a.objectname], files[b.filename][b.objectname])
+    finally:
+        _close(files)
+
+
+def _check_conversion(from_unit, to_unit):
+    if not from_unit or not to_unit:
+        raise Exception(
+            'No conversion defined for "%s" -> "%s"' % (from_unit or "", to_unit or "")
+        )
+
+    convert_unit(np.float64(0), from_unit, to_unit)
+
+
+def _sum(func, a, b):
+    """Add or subtract operands with the same (or a convertible) unit"""
+
+    a, b = _operand(a), _operand(b)
+
+    # scalars have the unit of the other operand
+    if isinstance(a, Constant) and not a.unit:
+        unit = b.unit
+    elif isinstance(b, Constant) and not b.unit:
+        unit = a.unit
+    else:
+        unit = a.unit
+        b = b.to(unit)
+
+    return apply(func, a, b, unit=unit)
+
+
+def _group(unit):
+    return "(%s)" % unit if any(c in unit for c in "*/^") else unit
+
+
+def _product(func, a, b):
+    """Multiply or divide operands and derive the unit"""
+
+    a, b = _operand(a), _operand(b)
+    ua, ub = a.unit or "", b.unit or ""
+
+    if func is np.multiply:
+        if not ua or not ub:
+            unit = ua or ub
+        else:
+            unit = ua + "*" + (_group(ub) if "/" in ub else ub)
+    elif not ub:
+        unit = ua
+    else:
+        unit = (ua or "1") + "/" + _group(ub)
+
+    return apply(func, a, b, unit=unit or None)
+
+
+def _power_unit(unit, exponent):
+    if not unit:
+        return unit
+
+    return "%s^%g" % (_group(unit), exponent)
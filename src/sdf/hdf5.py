@@ -4,6 +4,13 @@ import sdf
 import numpy as np
 import os
 import sys
+from typing import IO
+
+from . import cache, chunks, profile
+
+
+# group for side data that is not part of the SDF tree
+_side_data_group = "_sdf"
 
 
 def _to_python_str(s):
@@ -15,58 +22,138 @@ def _to_python_str(s):
         return s
 
 
-def load(filename: str | os.PathLike, objectname: str) -> sdf.Dataset | sdf.Group:
-    with h5py.File(filename, "r") as f:
-        datasets = {}
+def load(
+    filename: str | os.PathLike | IO[bytes], objectname: str
+) -> sdf.Dataset | sdf.Group:
+    with profile.call("hdf5.load", filename, objectname):
+        # file-like objects are not cached
+        if not hasattr(filename, "read"):
+            return cache.cached(
+                filename, objectname, lambda: _load_file(filename, objectname)
+            )
 
-        dsobj = f[objectname]
-        class_name = dsobj.__class__.__name__
+        return _load_file(filename, objectname)
 
-        if class_name == "Group":
-            group = _create_group(dsobj, datasets)
-            _restore_scales(datasets)
-            return group
-        elif class_name == "Dataset":
-            dataset = _create_dataset(dsobj, datasets)
 
-            for ri in range(dsobj.ndim):
-                if dsobj.dims[ri]:
-                    sobj = dsobj.dims[ri][0]
-                    s = _create_dataset(sobj, dict())
-                    s.is_scale = True
-                    dataset.scales[ri] = s
+def _load_file(filename, objectname):
+    with h5py.File(filename, "r") as f:
+        return _load(f, objectname)
 
-            return dataset
 
-        else:
-            raise Exception("Unexpected object")
+def _walk(filename):
+    """Yield (path, unit, ndim, has_scale) of the datasets in an SDF file"""
 
+    with h5py.File(filename, "r") as f:
+        stack = [f]
 
-def save(filename: str | os.PathLike, group: sdf.Group) -> None:
-    with h5py.File(filename, "w") as f:
-        datasets = dict()
-        _write_group(f, group, "/", datasets)
+        while stack:
+            gobj = stack.pop()
+            groups = []
 
-        # attach the scales
-        for ds, h5ds in datasets.items():
-            for i, s in enumerate(ds.scales):
-                if s is None:
+            for name, item in gobj.items():
+                if isinstance(item, h5py.Group):
+                    # skip the side data (e.g. decimated levels)
+                    if not (gobj.name == "/" and name == _side_data_group):
+                        groups.append(item)
                     continue
-                elif s in datasets:
-                    h5s = datasets[s]
-                    dimname = s._display_name
-                    if dimname is None:
-                        dimname = ""
-                    h5s.make_scale(_str(dimname))
-                    h5ds.dims[i].attach_scale(h5s)
-                else:
-                    print(
-                        "Cannot attach scale for '"
-                        + h5ds.name
-                        + "' because the referenced scale for dimension "
-                        + str(i)
-                        + " is not part of the file"
-                    )
+
+                unit = item.attrs.get("UNIT")
+                yield (
+                    item.name,
+                    None if unit is None else _to_python_str(unit),
+                    item.ndim,
+                    "DIMENSION_LIST" in item.attrs,
+                )
+
+            stack += reversed(groups)
+
+
+def _load(f, objectname):
+    datasets = {}
+
+    dsobj = f[objectname]
+    class_name = dsobj.__class__.__name__
+
+    if class_name == "Group":
+        group = _create_group(dsobj, datasets)
+        _restore_scales(datasets)
+        return group
+    elif class_name == "Dataset":
+        dataset = _create_dataset(dsobj, datasets)
+
+        for ri in range(dsobj.ndim):
+            if dsobj.dims[ri]:
+                sobj = dsobj.dims[ri][0]
+                s = _create_dataset(sobj, dict())
+                s.is_scale = True
+                dataset.scales[ri] = s
+
+        return dataset
+
+    else:
+        raise Exception("Unexpected object")
+
+
+def save(
+    filename: str | os.PathLike | IO[bytes],
+    group: sdf.Group,
+    decimation_threshold: int = None,
+    scale_offset: int = None,
+    compression_level: int = None,
+    zone_maps: bool = False,
+) -> None:
+    with profile.call("hdf5.save", filename), h5py.File(filename, "w") as f:
+        datasets = dict()
+        _write_group(f, group, "/", datasets, scale_offset, compression_level)
+
+        _attach_scales(datasets)
+
+        if decimation_threshold is not None:
+            from . import decimation
+
+            for ds, h5ds in datasets.items():
+                if (
+                    ds.data.ndim == 1
+                    and ds.data.size > decimation_threshold
+                    and ds.scales
+                    and ds.scales[0] in datasets
+                ):
+                    decimation._write_levels(f, ds, h5ds.name, decimation_threshold)
+
+        if zone_maps:
+            from . import zonemaps
+
+            for ds, h5ds in datasets.items():
+                if (
+                    ds.data.ndim == 1
+                    and ds.data.size > 0
+                    and ds.data.dtype.kind in "biuf"
+                ):
+                    zonemaps._write_zone_map(f, ds, h5ds)
+
+
+def _attach_scales(datasets):
+    """Attach the scales of the written datasets {sdf.Dataset: h5py.Dataset}"""
+
+    for ds, h5ds in datasets.items():
+        for i, s in enumerate(ds.scales):
+            if s is None:
+                continue
+            elif s in datasets:
+                h5s = datasets[s]
+                dimname = s._display_name
+                if dimname is None:
+                    dimname = ""
+                h5s.make_scale(_str(dimname))
+                h5ds.dims[i].attach_scale(h5s)
+            else:
+                print(
+                    "Cannot attach scale for '"
+                    + h5ds.name
+                    + "' because the referenced scale for dimension "
+                    + str(i)
+                    + " is not part of the file"
+                )
 
 
 def _create_group(gobj, datasets):
@@ -81,12 +168,18 @@ def _create_group(gobj, datasets):
     comment = gobj.attrs.get("COMMENT")
 
     for ds_name in gobj.keys():
+        # skip the side data (e.g. decimated levels)
+        if gobj.name == "/" and ds_name == _side_data_group:
+            continue
+
         # TODO: fix this?
         if isinstance(gobj[ds_name], h5py._hl.dataset.Dataset):
             ds_obj_list.append(gobj[ds_name])
         elif isinstance(gobj[ds_name], h5py._hl.group.Group):
             g_obj_list.append(gobj[ds_name])
 
+    profile.add(objects=1)
+
     child_groups = []
 
     for cgobj in g_obj_list:
@@ -109,7 +202,22 @@ def _create_dataset(dsobj, datasets):
     """Create a dataset from an h5py dataset"""
 
     _, name = os.path.split(dsobj.name)
-    ds = sdf.Dataset(name, data=dsobj[()])
+    ds = sdf.Dataset(name, data=chunks.read(dsobj))
+
+    profile.add(bytes_read=ds.data.nbytes, objects=1, arrays=1)
+
+    _read_attributes(dsobj, ds)
+
+    ds.scales = [None] * ds.data.ndim
+
+    # hard links (aliases) share the same HDF5 object
+    datasets.setdefault(dsobj, []).append(ds)
+
+    return ds
+
+
+def _read_attributes(dsobj, ds):
+    """Set the attributes of an sdf.Dataset from an h5py dataset"""
 
     for attr in dsobj.attrs:
         if attr == "COMMENT":
@@ -133,22 +241,16 @@ def _create_dataset(dsobj, datasets):
         else:
             ds.attributes[attr] = _to_python_str(dsobj.attrs[attr])
 
-    ds.scales = [None] * ds.data.ndim
-
-    datasets[dsobj] = ds
-
-    return ds
-
 
 def _restore_scales(datasets):
-    for dsobj, ds in datasets.items():
-        for i in range(ds.data.ndim):
-            if dsobj.dims[i]:
-                sobj = dsobj.dims[i][0]
-                scale = datasets[sobj]
-                scale.is_scale = True
-                ds.scales[i] = scale
-                pass
+    for dsobj, ds_list in datasets.items():
+        for ds in ds_list:
+            for i in range(ds.data.ndim):
+                if dsobj.dims[i]:
+                    sobj = dsobj.dims[i][0]
+                    scale = datasets[sobj][0]
+                    scale.is_scale = True
+                    ds.scales[i] = scale
 
 
 def _str(s):
@@ -161,15 +263,24 @@ def _str(s):
         return np.bytes_(s.encode("utf-8"))
 
 
-def _write_group(f, g, path, datasets):
+def _write_group(f, g, path, datasets, scale_offset=None, compression_level=None):
     if path == "/":
         gobj = f
     else:
         gobj = f.create_group(path)
 
+    profile.add(objects=1)
+
     # iterate over the child groups
     for subgroup in g.groups:
-        _write_group(f, subgroup, path + subgroup.name + "/", datasets)
+        _write_group(
+            f,
+            subgroup,
+            path + subgroup.name + "/",
+            datasets,
+            scale_offset,
+            compression_level,
+        )
 
     if g.comment is not None:
         gobj.attrs["COMMENT"] = _str(g.comment)
@@ -179,15 +290,43 @@ def _write_group(f, g, path, datasets):
 
     # write the datasets
     for ds in g.datasets:
-        _write_dataset(f, ds, path, datasets)
+        _write_dataset(f, ds, path, datasets, scale_offset, compression_level)
+
 
+def _write_dataset(f, ds, path, datasets, scale_offset=None, compression_level=None):
+    data = np.asarray(ds.data)
+
+    if data.ndim == 0 or data.size == 0:
+        f[path + ds.name] = ds.data
+    elif scale_offset is None or ds.is_scale:
+        if compression_level is None:
+            f[path + ds.name] = ds.data
+        else:
+            # compress the chunks in parallel
+            chunks.create_dataset(f, path + ds.name, data, compression_level)
+    elif data.dtype.kind == "f":
+        # quantise to scale_offset decimal digits
+        f.create_dataset(path + ds.name, data=data, scaleoffset=scale_offset)
+    elif data.dtype.kind in "iu":
+        # store the integers with the minimum number of bits
+        f.create_dataset(path + ds.name, data=data, scaleoffset=0)
+    else:
+        f[path + ds.name] = ds.data
 
-def _write_dataset(f, ds, path, datasets):
-    f[path + ds.name] = ds.data
     dsobj = f[path + ds.name]
 
+    profile.add(bytes_written=data.nbytes, objects=1)
+
     datasets[ds] = dsobj
 
+    _write_attributes(dsobj, ds)
+
+    return dsobj
+
+
+def _write_attributes(dsobj, ds):
+    """Write the attributes of an sdf.Dataset to an h5py dataset"""
+
     if ds.comment:
         dsobj.attrs["COMMENT"] = _str(ds.comment)
 
@@ -211,4 +350,177 @@ def _write_dataset(f, ds, path, datasets):
 
         h5py.h5ds.set_scale(dsobj.id, _str(dimname))
 
-    return dsobj
+
+# the attributes written by _write_attributes()
+_dataset_attributes = ["COMMENT", "NAME", "RELATIVE_QUANTITY", "UNIT", "DISPLAY_UNIT"]
+
+# the attributes of the dimension scales that are not copied to other datasets
+_scale_attributes = {"CLASS", "DIMENSION_LIST", "REFERENCE_LIST"}
+
+
+class Editor:
+    """
+    An SDF file opened for in-place updates (see sdf.open())
+
+    Only the affected HDF5 objects are written and the dimension scales stay
+    attached. The space of deleted objects is not reclaimed (use h5repack to
+    compact the file).
+    """
+
+    def __init__(self, filename: str | os.PathLike, mode: str = "r+"):
+        if mode not in {"r+", "a"}:
+            raise Exception('mode must be "r+" or "a"')
+
+        self.filename = filename
+        self._f = h5py.File(filename, mode)
+
+    def __enter__(self) -> Editor:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self) -> None:
+        self._f.close()
+
+    def add(
+        self, path: str, obj: sdf.Dataset | sdf.Group, scales: list[str] = None
+    ) -> None:
+        """Add a Dataset or Group to the group `path`
+
+        The scales of the datasets must be part of `obj` or, for a Dataset,
+        can be the paths of existing datasets in the file given in `scales`
+        (one per dimension or None).
+        """
+
+        path = path.rstrip("/") + "/"
+
+        if path != "/":
+            self._f.require_group(path)
+
+        datasets = {}
+
+        if isinstance(obj, sdf.Group):
+            _write_group(self._f, obj, path + obj.name + "/", datasets)
+        else:
+            _write_dataset(self._f, obj, path, datasets)
+
+        _attach_scales(datasets)
+
+        if scales is not None:
+            dsobj = datasets[obj]
+            for i, scale in enumerate(scales):
+                if scale is not None:
+                    sobj = self._f[scale]
+                    if not sobj.is_scale:
+                        sobj.make_scale(_str(""))
+                    dsobj.dims[i].attach_scale(sobj)
+
+    def replace(self, objectname: str, dataset: sdf.Dataset) -> None:
+        """Replace the data and attributes of a dataset
+
+        The data is written in place if the shape and type are unchanged.
+        Otherwise the dataset is recreated and its scales (and the datasets
+        that use it as a scale) are attached again.
+        """
+
+        f = self._f
+        dsobj = f[objectname]
+        data = np.asarray(dataset.data)
+
+        self._delete_side_data(dsobj.name)
+
+        if dsobj.shape == data.shape and dsobj.dtype == data.dtype:
+            dsobj[...] = data
+        else:
+            scales = [dim[0].name if len(dim) > 0 else None for dim in dsobj.dims]
+            users = self._users(dsobj)
+            dimname = dsobj.attrs.get("NAME", "") if dsobj.is_scale else None
+
+            self._detach(dsobj)
+            del f[objectname]
+
+            dsobj = f.create_dataset(objectname, data=data)
+
+            if dimname is not None:
+                h5py.h5ds.set_scale(dsobj.id, _str(_to_python_str(dimname)))
+
+            for i, scale in enumerate(scales[: data.ndim]):
+                if scale is not None:
+                    dsobj.dims[i].attach_scale(f[scale])
+
+            for name, dim in users:
+                f[name].dims[dim].attach_scale(dsobj)
+
+        for attr in _dataset_attributes:
+            if attr in dsobj.attrs and not (attr == "NAME" and dsobj.is_scale):
+                del dsobj.attrs[attr]
+
+        _write_attributes(dsobj, dataset)
+
+    def delete(self, objectname: str) -> None:
+        """Delete a Dataset or Group and detach the scales of its datasets"""
+
+        obj = self._f[objectname]
+
+        if isinstance(obj, h5py.Dataset):
+            dsobjs = [obj]
+        else:
+            dsobjs = []
+            obj.visititems(
+                lambda _, item: (
+                    dsobjs.append(item) if isinstance(item, h5py.Dataset) else None
+                )
+            )
+
+        for dsobj in dsobjs:
+            # keep the scales of hard links (aliases)
+            if h5py.h5o.get_info(dsobj.id).rc == 1:
+                self._detach(dsobj)
+                self._delete_side_data(dsobj.name)
+
+        del self._f[objectname]
+
+    def set_attribute(self, objectname: str, name: str, value: str | None) -> None:
+        """Set (or delete if `value` is None) an attribute (e.g. "UNIT")"""
+
+        attrs = self._f[objectname].attrs
+
+        if value is None:
+            if name in attrs:
+                del attrs[name]
+        else:
+            attrs[name] = _str(value)
+
+    def _delete_side_data(self, name):
+        """Delete the side data of a dataset (e.g. decimated levels and zone maps)"""
+
+        side_data = self._f.get("/" + _side_data_group)
+
+        if side_data is None:
+            return
+
+        for kind in list(side_data.keys()):
+            path = side_data.name + "/" + kind + name
+            if path in self._f:
+                del self._f[path]
+
+    def _users(self, dsobj):
+        """Get the (path, dimension) of the datasets that use `dsobj` as a scale"""
+
+        if "REFERENCE_LIST" not in dsobj.attrs:
+            return []
+
+        return [
+            (self._f[ref].name, int(dim)) for ref, dim in dsobj.attrs["REFERENCE_LIST"]
+        ]
+
+    def _detach(self, dsobj):
+        """Detach the scales of a dataset and the dataset from its users"""
+
+        for dim in dsobj.dims:
+            for scale in list(dim.values()):
+                dim.detach_scale(scale)
+
+        for name, dim in self._users(dsobj):
+            self._f[name].dims[dim].detach_scale(dsobj)
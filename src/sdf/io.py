@@ -0,0 +1,357 @@
+"""
+Import tabular data (CSV and Excel) to SDF
+
+The files are parsed in blocks of rows and every block is appended to chunked
+datasets, so the memory usage depends on the block size and not on the size of
+the file. The first header row contains the names and the second one the units
+of the columns. The first imported column is the scale of the other columns.
+"""
+
+from __future__ import annotations
+
+import csv
+import itertools
+import os
+import re
+import zipfile
+from os import PathLike
+from xml.etree.ElementTree import iterparse
+
+import h5py
+import numpy as np
+
+from .hdf5 import _str
+
+# namespaces of the Office Open XML files
+_ns_main = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_ns_rel = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_ns_pkg_rel = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def from_csv(
+    filename: str | PathLike,
+    outfile: str | PathLike = None,
+    delimiter: str = ",",
+    header_rows: int = 2,
+    first_column: int = 0,
+    block_rows: int = 65536,
+    compression_level: int = 4,
+    encoding: str = "utf-8-sig",
+) -> str:
+    """Import a CSV file to SDF
+
+    Parameters
+    ----------
+    filename : str
+        The CSV file to import.
+    outfile : str, optional
+        The SDF file to write. Default is `filename` with the extension ".sdf".
+    delimiter : str, optional
+        The delimiter of the columns.
+    header_rows : int, optional
+        The number of header rows (the names, the units and rows to skip).
+    first_column : int, optional
+        The first column to import (columns before are ignored, e.g. labels).
+    block_rows : int, optional
+        The number of rows to parse at once. This is also the chunk size.
+    compression_level : int, optional
+        The gzip compression level (0-9) or None to write uncompressed datasets.
+    encoding : str, optional
+        The encoding of the file (the default skips a UTF-8 byte order mark).
+
+    Returns
+    -------
+    outfile : str
+        The name of the SDF file.
+    """
+
+    with open(filename, "r", encoding=encoding, newline="") as f:
+        header = list(csv.reader(itertools.islice(f, header_rows), delimiter=delimiter))
+        names, units = _header(header, first_column)
+        usecols = range(first_column, first_column + len(names))
+
+        def blocks():
+            while True:
+                lines = list(itertools.islice(f, block_rows))
+                if not lines:
+                    return
+                yield _parse_lines(lines, delimiter, usecols)
+
+        return _write(
+            filename, outfile, names, units, blocks(), block_rows, compression_level
+        )
+
+
+def _parse_lines(lines, delimiter, usecols):
+    """Parse lines of numbers to a 2-d array (empty fields are NaN)"""
+
+    try:
+        return np.loadtxt(
+            lines, delimiter=delimiter, usecols=usecols, ndmin=2, dtype=np.float64
+        )
+    except ValueError:
+        # missing values
+        return np.genfromtxt(
+            lines, delimiter=delimiter, usecols=usecols, ndmin=2, dtype=np.float64
+        )
+
+
+def from_xlsx(
+    filename: str | PathLike,
+    outfile: str | PathLike = None,
+    sheet: int | str = 0,
+    header_rows: int = 2,
+    first_column: int = 0,
+    block_rows: int = 65536,
+    compression_level: int = 4,
+) -> str:
+    """Import a sheet of an Excel workbook (.xlsx) to SDF
+
+    The sheet is parsed incrementally with the standard library. The cells
+    that are empty or do not contain a number are NaN. See from_csv() for the
+    parameters. `sheet` is the index or name of the sheet.
+    """
+
+    with zipfile.ZipFile(filename) as z:
+        strings = _shared_strings(z)
+        rows = _xlsx_rows(z, _sheet_path(z, sheet), strings)
+
+        header = [[], []]
+
+        for index, values in rows:
+            if index < 2:
+                header[index] = [
+                    str(values.get(j, "")) for j in range(max(values, default=-1) + 1)
+                ]
+            if index >= header_rows:
+                # the first data row
+                rows = itertools.chain([(index, values)], rows)
+                break
+            elif index == header_rows - 1:
+                break
+
+        names, units = _header(header, first_column)
+        ncols = len(names)
+
+        def blocks():
+            block = np.full((block_rows, ncols), np.nan)
+            n = 0
+            row = None
+
+            for index, values in rows:
+                if index < header_rows:
+                    continue
+
+                # rows without cells are NaN
+                if row is not None:
+                    n += index - row - 1
+                row = index
+
+                while n >= block_rows:
+                    yield block
+                    block = np.full((block_rows, ncols), np.nan)
+                    n -= block_rows
+
+                for j, value in values.items():
+                    if first_column <= j < first_column + ncols and isinstance(
+                        value, float
+                    ):
+                        block[n, j - first_column] = value
+
+                n += 1
+
+                if n == block_rows:
+                    yield block
+                    block = np.full((block_rows, ncols), np.nan)
+                    n = 0
+
+            if n > 0:
+                yield block[:n]
+
+        return _write(
+            filename, outfile, names, units, blocks(), block_rows, compression_level
+        )
+
+
+def _shared_strings(z):
+    """Read the shared strings of a workbook"""
+
+    if "xl/sharedStrings.xml" not in z.namelist():
+        return []
+
+    strings = []
+
+    with z.open("xl/sharedStrings.xml") as f:
+        for _, elem in iterparse(f):
+            if elem.tag == _ns_main + "si":
+                strings.append("".join(t.text or "" for t in elem.iter(_ns_main + "t")))
+                elem.clear()
+
+    return strings
+
+
+def _sheet_path(z, sheet):
+    """Get the path of a sheet (by index or name) in the workbook"""
+
+    with z.open("xl/workbook.xml") as f:
+        sheets = [elem for _, elem in iterparse(f) if elem.tag == _ns_main + "sheet"]
+
+    if isinstance(sheet, str):
+        matches = [s for s in sheets if s.get("name") == sheet]
+        if not matches:
+            raise Exception("Sheet '%s' does not exist" % sheet)
+        rid = matches[0].get(_ns_rel + "id")
+    else:
+        rid = sheets[sheet].get(_ns_rel + "id")
+
+    with z.open("xl/_rels/workbook.xml.rels") as f:
+        for _, elem in iterparse(f):
+            if elem.tag == _ns_pkg_rel + "Relationship" and elem.get("Id") == rid:
+                target = elem.get("Target")
+                return target.lstrip("/") if target.startswith("/") else "xl/" + target
+
+    raise Exception("Sheet %r does not exist" % sheet)
+
+
+_cell_pattern = re.compile(r"([A-Z]+)")
+
+
+def _column_index(ref):
+    index = 0
+
+    for c in _cell_pattern.match(ref).group(1):
+        index = index * 26 + ord(c) - ord("A") + 1
+
+    return index - 1
+
+
+def _xlsx_rows(z, path, strings):
+    """Yield (row index, {column index: value}) of a sheet
+
+    The values are floats for numbers and booleans and str otherwise.
+    """
+
+    with z.open(path) as f:
+        sheet_data = None
+        row_index = -1
+
+        for event, elem in iterparse(f, events=("start", "end")):
+            if event == "start":
+                if elem.tag == _ns_main + "sheetData":
+                    sheet_data = elem
+                continue
+
+            if elem.tag != _ns_main + "row":
+                continue
+
+            r = elem.get("r")
+            row_index = int(r) - 1 if r is not None else row_index + 1
+            values = {}
+
+            for j, c in enumerate(elem.iter(_ns_main + "c")):
+                ref = c.get("r")
+                j = _column_index(ref) if ref is not None else j
+                t = c.get("t", "n")
+
+                if t == "inlineStr":
+                    values[j] = "".join(x.text or "" for x in c.iter(_ns_main + "t"))
+                    continue
+
+                v = c.find(_ns_main + "v")
+
+                if v is None or v.text is None:
+                    continue
+                elif t == "s":
+                    values[j] = strings[int(v.text)]
+                elif t in {"n", "b"}:
+                    values[j] = float(v.text)
+                else:
+                    values[j] = v.text
+
+            yield row_index, values
+
+            # release the parsed rows
+            if sheet_data is not None:
+                sheet_data.clear()
+
+
+def _header(header, first_column):
+    """Get the names and units of the columns from the header rows"""
+
+    names = list(header[0][first_column:]) if header else []
+    units = list(header[1][first_column:]) if len(header) > 1 else []
+
+    # ignore the trailing columns without a name
+    while names and not names[-1].strip():
+        names.pop()
+
+    if not names:
+        raise Exception("The file has no column names")
+
+    units = [u.strip() for u in units[: len(names)]]
+    units += [""] * (len(names) - len(units))
+
+    unique = []
+
+    for i, name in enumerate(names):
+        # "/" separates the groups
+        name = name.strip().replace("/", "_") or "column%d" % (first_column + i + 1)
+        while name in unique:
+            name += "_"
+        unique.append(name)
+
+    return unique, units
+
+
+def _write(filename, outfile, names, units, blocks, block_rows, compression_level):
+    """Append the blocks of rows to chunked datasets with a shared scale"""
+
+    if outfile is None:
+        outfile = os.path.splitext(os.fspath(filename))[0] + ".sdf"
+
+    outfile = os.fspath(outfile)
+
+    if compression_level is None:
+        compression = {}
+    else:
+        compression = dict(
+            compression="gzip", compression_opts=compression_level, shuffle=True
+        )
+
+    with h5py.File(outfile, "w") as f:
+        f.attrs["COMMENT"] = _str(
+            "Imported from " + os.path.basename(os.fspath(filename))
+        )
+
+        dsobjs = [
+            f.create_dataset(
+                name,
+                shape=(0,),
+                maxshape=(None,),
+                dtype=np.float64,
+                chunks=(block_rows,),
+                **compression,
+            )
+            for name in names
+        ]
+
+        n = 0
+
+        for block in blocks:
+            m = block.shape[0]
+            for j, dsobj in enumerate(dsobjs):
+                dsobj.resize((n + m,))
+                dsobj[n : n + m] = block[:, j]
+            n += m
+
+        for dsobj, unit in zip(dsobjs, units):
+            if unit:
+                dsobj.attrs["UNIT"] = _str(unit)
+
+        # the first column is the scale
+        h5py.h5ds.set_scale(dsobjs[0].id, _str(""))
+
+        for dsobj in dsobjs[1:]:
+            dsobj.dims[0].attach_scale(dsobjs[0])
+
+    return outfile
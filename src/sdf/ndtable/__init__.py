@@ -1,76 +1,213 @@
-from ctypes import c_double, c_void_p, c_int, byref, cdll
+from ctypes import addressof, c_double, c_void_p, c_int, byref, cdll, sizeof
 from pathlib import Path
 
 import numpy as np
 import sys
 from platform import machine
 
+from .. import profile
 
-if machine().lower() in {"aarch64", "arm64"}:
-    _platform = "aarch64"
-elif machine().lower() in {"amd64", "i386", "i686", "x86", "x86_64", "x86pc"}:
-    if sys.maxsize > 2**32:
-        _platform = "x86_64"
+
+def _load_library():
+    """Load the NDTable shared library and declare its functions"""
+
+    global _create_table, _evaluate, _evaluate_derivative
+    global _close_table
+
+    if machine().lower() in {"aarch64", "arm64"}:
+        _platform = "aarch64"
+    elif machine().lower() in {"amd64", "i386", "i686", "x86", "x86_64", "x86pc"}:
+        if sys.maxsize > 2**32:
+            _platform = "x86_64"
+        else:
+            _platform = "x86"
+    else:
+        raise Exception(f"Unsupported architecture: {machine()}")
+
+    if sys.platform.startswith("win"):
+        _platform += "-windows"
+        _sl_name = "NDTable.dll"
+    elif sys.platform.startswith("linux"):
+        _platform += "-linux"
+        _sl_name = "libNDTable.so"
+    elif sys.platform.startswith("darwin"):
+        _platform += "-darwin"
+        _sl_name = "libndtable.dylib"
     else:
-        _platform = "x86"
-else:
-    raise Exception(f"Unsupported architecture: {machine()}")
-
-if sys.platform.startswith("win"):
-    _platform += "-windows"
-    _sl_name = "NDTable.dll"
-elif sys.platform.startswith("linux"):
-    _platform += "-linux"
-    _sl_name = "libNDTable.so"
-elif sys.platform.startswith("darwin"):
-    _platform += "-darwin"
-    _sl_name = "libndtable.dylib"
-else:
-    raise Exception("Unsupported platform: " + sys.platform)
-
-_shared_library = Path(__file__).parent / _platform / _sl_name
-
-_ndtable = cdll.LoadLibrary(str(_shared_library))
-
-# PYTHON_API ModelicaNDTable_h create_table(int ndims, const int *dims, const double *data, const double **scales) {
-_create_table = _ndtable.create_table
-_create_table.argtypes = [c_int, c_void_p, c_void_p, (c_void_p * 32)]
-_create_table.restype = c_void_p
-
-# PYTHON_API int evaluate(
-#     ModelicaNDTable_h table,
-#     int ndims,
-#     const double **params,
-#     ModelicaNDTable_InterpMethod_t interp_method,
-#     ModelicaNDTable_ExtrapMethod_t extrap_method,
-#     int nvalues,
-#     double *value);
-_evaluate = _ndtable.evaluate
-_evaluate.argtypes = [c_void_p, c_int, c_void_p, c_int, c_int, c_int, c_void_p]
-_evaluate.restype = c_int
-
-# PYTHON_API int evaluate_derivative(
-#     ModelicaNDTable_h table,
-#     int nparams,
-#     const double params[],
-#     const double delta_params[],
-#     ModelicaNDTable_InterpMethod_t interp_method,
-#     ModelicaNDTable_ExtrapMethod_t extrap_method,
-#     double *value);
-_evaluate_derivative = _ndtable.evaluate_derivative
-_evaluate_derivative.argtypes = [
-    c_void_p,
-    c_int,
-    c_void_p,
-    c_void_p,
-    c_int,
-    c_int,
-    c_void_p,
-]
-_evaluate_derivative.restype = c_int
-
-_close_table = _ndtable.close_table
-_close_table.argtypes = [c_void_p]
+        raise Exception("Unsupported platform: " + sys.platform)
+
+    _shared_library = Path(__file__).parent / _platform / _sl_name
+
+    _ndtable = cdll.LoadLibrary(str(_shared_library))
+
+    # PYTHON_API ModelicaNDTable_h create_table(int ndims, const int *dims, const double *data, const double **scales) {
+    _create_table = _ndtable.create_table
+    _create_table.argtypes = [c_int, c_void_p, c_void_p, (c_void_p * 32)]
+    _create_table.restype = c_void_p
+
+    # PYTHON_API int evaluate(
+    #     ModelicaNDTable_h table,
+    #     int ndims,
+    #     const double **params,
+    #     ModelicaNDTable_InterpMethod_t interp_method,
+    #     ModelicaNDTable_ExtrapMethod_t extrap_method,
+    #     int nvalues,
+    #     double *value);
+    _evaluate = _ndtable.evaluate
+    _evaluate.argtypes = [c_void_p, c_int, c_void_p, c_int, c_int, c_int, c_void_p]
+    _evaluate.restype = c_int
+
+    # PYTHON_API int evaluate_derivative(
+    #     ModelicaNDTable_h table,
+    #     int nparams,
+    #     const double params[],
+    #     const double delta_params[],
+    #     ModelicaNDTable_InterpMethod_t interp_method,
+    #     ModelicaNDTable_ExtrapMethod_t extrap_method,
+    #     double *value);
+    _evaluate_derivative = _ndtable.evaluate_derivative
+    _evaluate_derivative.argtypes = [
+        c_void_p,
+        c_int,
+        c_void_p,
+        c_void_p,
+        c_int,
+        c_int,
+        c_void_p,
+    ]
+    _evaluate_derivative.restype = c_int
+
+    _close_table = _ndtable.close_table
+    _close_table.argtypes = [c_void_p]
+
+
+# the functions of the shared library (loaded on first use)
+_create_table = None
+_evaluate = None
+_evaluate_derivative = None
+_close_table = None
+
+
+def _create_c_table(data, scales):
+    """Create a table in the shared library"""
+
+    if _create_table is None:
+        _load_library()
+
+    dims = np.asarray(data.shape, np.int32)
+    scales_ = (c_void_p * 32)()
+    for i, scale in enumerate(scales):
+        scales_[i] = scale.ctypes.data_as(c_void_p)
+
+    return _create_table(
+        c_int(data.ndim),
+        dims.ctypes.data_as(c_void_p),
+        data.ctypes.data_as(c_void_p),
+        scales_,
+    )
+
+
+# max. number of dimensions for the vectorized linear interpolation
+_max_linear_dims = 8
+
+
+def _evaluate_linear(data, scales, points, extrap, gradient=False):
+    """Evaluate a vector-valued table with multi-linear interpolation
+
+    The brackets and weights are computed once per point for all outputs.
+    If `gradient` is True the tuple (values, gradients) is returned where the
+    gradients have the shape of the values + (ndims,).
+    """
+
+    shape = points[0].shape
+    noutputs = data.shape[-1]
+    values = data.reshape(-1, noutputs)
+
+    strides = np.cumprod([1] + [s.size for s in scales[:0:-1]])[::-1]
+    lower = []
+    upper = []
+    weights = []
+    slopes = []
+
+    for scale, point, stride in zip(scales, points, strides):
+        point = point.ravel()
+
+        if scale.size == 1:
+            i = np.zeros(point.shape, dtype=np.intp)
+            lower.append(i)
+            upper.append(i)
+            weights.append(np.zeros(point.shape))
+            slopes.append(np.zeros(point.shape))
+            continue
+
+        i = np.clip(np.searchsorted(scale, point, side="right") - 1, 0, scale.size - 2)
+        h = scale[i + 1] - scale[i]
+        t = (point - scale[i]) / h
+        dt = 1.0 / h
+
+        if extrap == "hold":
+            # the value is constant outside the scale
+            dt = np.where((t < 0.0) | (t > 1.0), 0.0, dt)
+            t = np.clip(t, 0.0, 1.0)
+
+        lower.append(i * stride)
+        upper.append((i + 1) * stride)
+        weights.append(t)
+        slopes.append(dt)
+
+    out = np.zeros((points[0].size, noutputs))
+
+    if gradient:
+        grad = np.zeros((points[0].size, noutputs, len(scales)))
+
+    for corner in np.ndindex(*([2] * len(scales))):
+        index = 0
+        w = 1.0
+        for bit, lo, hi, t in zip(corner, lower, upper, weights):
+            index = index + (hi if bit else lo)
+            w = w * (t if bit else 1.0 - t)
+        out += w[:, np.newaxis] * values[index]
+
+        if gradient:
+            for d in range(len(scales)):
+                # the derivative of the weight with respect to coordinate d
+                dw = slopes[d] if corner[d] else -slopes[d]
+                for e, (bit, t) in enumerate(zip(corner, weights)):
+                    if e != d:
+                        dw = dw * (t if bit else 1.0 - t)
+                grad[:, :, d] += dw[:, np.newaxis] * values[index]
+
+    if gradient:
+        return (
+            out.reshape(shape + (noutputs,)),
+            grad.reshape(shape + (noutputs, len(scales))),
+        )
+
+    return out.reshape(shape + (noutputs,))
+
+
+def _morton_order(scales, points):
+    """Get the order of the points along the Z-order curve of their cells
+
+    The bits of the cell indices of all dimensions are interleaved to a 64 bit
+    key, so points in neighbouring cells are close to each other in the order.
+    """
+
+    bits = max(1, 64 // len(scales))
+    key = np.zeros(points[0].size, dtype=np.uint64)
+
+    for d, (scale, point) in enumerate(zip(scales, points)):
+        index = np.searchsorted(scale, point).astype(np.uint64)
+
+        # drop the low bits of the index if there are too many cells
+        shift = max(0, int(scale.size).bit_length() - bits)
+        index >>= np.uint64(shift)
+
+        for b in range(min(bits, int(scale.size).bit_length())):
+            bit = (index >> np.uint64(b)) & np.uint64(1)
+            key |= bit << np.uint64(b * len(scales) + d)
+
+    return np.argsort(key, kind="stable")
 
 
 class NDTable(object):
@@ -79,11 +216,15 @@ class NDTable(object):
 
     Attributes
     ----------
-    data : ndarray
-        The values to interpolate.
+    data : ndarray or None
+        The values of a vector-valued table with K outputs (shape dims + (K,)).
+        None for a scalar table whose values are kept by the shared library.
     scales : tuple of ndarrays
-        The scales for `data`. There must be one scale for every dimension of `data`.
+        The scales for `data`. There must be one scale for every dimension of `data`
+        (except the trailing output dimension of a vector-valued table).
         The values must be strictly monotonic increasing.
+    noutputs : int or None
+        The number of outputs of a vector-valued table or None for a scalar table.
     """
 
     _interp_methods = {
@@ -106,8 +247,8 @@ class NDTable(object):
             scales[i] = np.asanyarray(scale, dtype=np.float64, order="C")
 
         # check the arguments
-        assert data.ndim <= 32, "Max. number of dimensions is 32"
-        assert len(scales) == data.ndim, (
+        assert len(scales) <= 32, "Max. number of dimensions is 32"
+        assert len(scales) in {data.ndim, data.ndim - 1}, (
             "The number of scales must match the number of dimensions"
         )
         for i, scale in enumerate(scales):
@@ -119,25 +260,42 @@ class NDTable(object):
                 "The scale for dimension %d does not match the shape of data" % i
             )
 
-        dims = np.asarray(data.shape, np.int32)
-        scales_ = (c_void_p * 32)()
-        for i, scale in enumerate(scales):
-            scales_[i] = scale.ctypes.data_as(c_void_p)
-        self._table = _create_table(
-            c_int(data.ndim),
-            dims.ctypes.data_as(c_void_p),
-            data.ctypes.data_as(c_void_p),
-            scales_,
-        )
+        self.scales = scales
+        self.noutputs = data.shape[-1] if len(scales) == data.ndim - 1 else None
+
+        if self.noutputs is None:
+            # the shared library keeps a copy of the values
+            self.data = None
+            self._tables = [_create_c_table(data, scales)]
+            self._table = self._tables[0]
+        else:
+            self.data = data
+            # one table per output (created when a method other than "linear" is used)
+            self._tables = None
 
         # save close function from garbage collection
         self._close_table = _close_table
 
-    def evaluate(self, points, interp="linear", extrap="hold"):
+    def _output_tables(self):
+        """Get the tables of the outputs of a vector-valued table"""
+
+        if self._tables is None:
+            self._tables = [
+                _create_c_table(np.ascontiguousarray(self.data[..., k]), self.scales)
+                for k in range(self.noutputs)
+            ]
+            self._close_table = _close_table
+
+        return self._tables
+
+    def evaluate(
+        self, points, interp="linear", extrap="hold", out=None, sort_points=False
+    ):
         """
         Evaluate the lookup table at the coordinates in `points`.
 
-        Returns an array of the same shape as the coordinates in `points`.
+        Returns an array of the same shape as the coordinates in `points`
+        (with a trailing dimension of size `noutputs` for vector-valued tables).
 
         Parameters
         ----------
@@ -149,11 +307,19 @@ class NDTable(object):
         extrap : string, optional
             The extrapolation method (one of 'hold' or 'linear')
             Default is 'hold'.
+        out : ndarray, optional
+            A C-contiguous float64 array of the shape of the result to write
+            the values to (avoids the allocation for repeated calls).
+        sort_points : bool, optional
+            Evaluate the points in the Z-order (Morton order) of their cells and
+            return the values in the original order. This improves the cache
+            locality for many scattered points in large tables.
+            Default is False.
 
         Returns
         -------
         samples : ndarray
-            The evaluated points.
+            The evaluated points (`out` if given).
 
         Example
         --------
@@ -183,6 +349,44 @@ class NDTable(object):
 
         """
 
+        with profile.call("NDTable.evaluate"):
+            if sort_points:
+                values = self._evaluate_sorted(points, interp, extrap, out)
+            else:
+                values = self._evaluate_points(points, interp, extrap, out)
+            profile.add(arrays=0 if out is not None else 1)
+            return values
+
+    def _check_out(self, out, shape):
+        expected = shape if self.noutputs is None else shape + (self.noutputs,)
+        assert out.shape == expected, "out must have the shape %s" % (expected,)
+        assert out.dtype == np.float64 and out.flags.c_contiguous, (
+            "out must be a C-contiguous float64 array"
+        )
+
+    def _evaluate_sorted(self, points, interp, extrap, out):
+        points = [np.asarray(p, np.float64) for p in points]
+        shape = points[0].shape
+
+        for p in points[1:]:
+            assert p.shape == shape, "The arrays in points must have the same shape"
+
+        points = [p.ravel() for p in points]
+        order = _morton_order(self.scales, points)
+        values = self._evaluate_points([p[order] for p in points], interp, extrap, None)
+
+        # scatter the values back to the original order
+        if out is None:
+            result = np.empty(shape + values.shape[1:])
+        else:
+            self._check_out(out, shape)
+            result = out
+
+        result.reshape((-1,) + values.shape[1:])[order] = values
+
+        return result
+
+    def _evaluate_points(self, points, interp, extrap, out):
         points = list(points)
 
         for i, _ in enumerate(points):
@@ -200,16 +404,43 @@ class NDTable(object):
             'Unknown extrapolation method "%s"' % extrap
         )
 
+        if out is not None:
+            self._check_out(out, shape)
+
+        if self.noutputs is None:
+            return self._evaluate(self._table, points, interp, extrap, out)
+
+        if interp == "linear" and len(self.scales) <= _max_linear_dims:
+            values = _evaluate_linear(self.data, self.scales, points, extrap)
+        else:
+            values = np.stack(
+                [
+                    self._evaluate(table, points, interp, extrap)
+                    for table in self._output_tables()
+                ],
+                axis=-1,
+            )
+
+        if out is None:
+            return values
+
+        out[...] = values
+
+        return out
+
+    def _evaluate(self, table, points, interp, extrap, out=None):
+        points = [np.ascontiguousarray(p) for p in points]
+
         interp_method = c_int(self._interp_methods[interp])
         extrap_method = c_int(self._extrap_methods[extrap])
 
-        values = np.empty(shape)
+        values = np.empty(points[0].shape) if out is None else out
         params = (c_void_p * len(points))()
         for i, param in enumerate(points):
             params[i] = param.ctypes.data_as(c_void_p)
 
         ret = _evaluate(
-            c_void_p(self._table),
+            c_void_p(table),
             c_int(len(params)),
             params,
             interp_method,
@@ -222,6 +453,82 @@ class NDTable(object):
 
         return values
 
+    def bind(self, interp="linear", extrap="hold"):
+        """
+        Get a function that evaluates the table at a single point
+
+        The function takes the coordinates of the point as floats and returns
+        a float (a new array of size `noutputs` for vector-valued tables). The
+        arguments of the shared library are created once, so a call costs
+        little more than the interpolation itself.
+
+        Example
+        --------
+        >>> f = lut.bind()
+        >>> f(0.5, -0.5)
+            -0.25
+        """
+
+        assert interp in self._interp_methods, (
+            'Unknown interpolation method "%s"' % interp
+        )
+        assert extrap in self._extrap_methods, (
+            'Unknown extrapolation method "%s"' % extrap
+        )
+
+        tables = [self._table] if self.noutputs is None else self._output_tables()
+        tables = [c_void_p(table) for table in tables]
+
+        ndims = len(self.scales)
+        evaluate = _evaluate
+        ndims_ = c_int(ndims)
+        interp_method = c_int(self._interp_methods[interp])
+        extrap_method = c_int(self._extrap_methods[extrap])
+        nvalues = c_int(1)
+
+        # one value per coordinate
+        x = (c_double * ndims)()
+        params = (c_void_p * ndims)(
+            *[addressof(x) + i * sizeof(c_double) for i in range(ndims)]
+        )
+        value = c_double()
+        value_ = byref(value)
+
+        if self.noutputs is None:
+            table = tables[0]
+
+            def f(*point):
+                x[:] = point
+                ret = evaluate(
+                    table, ndims_, params, interp_method, extrap_method, nvalues, value_
+                )
+                assert ret == 0, "An error occurred during interpolation"
+                return value.value
+
+        else:
+
+            def f(*point):
+                x[:] = point
+                out = np.empty(len(tables))
+                for k, table in enumerate(tables):
+                    ret = evaluate(
+                        table,
+                        ndims_,
+                        params,
+                        interp_method,
+                        extrap_method,
+                        nvalues,
+                        value_,
+                    )
+                    assert ret == 0, "An error occurred during interpolation"
+                    out[k] = value.value
+                return out
+
+        # keep the tables alive
+        f.table = self
+
+        return f
+
     def evaluate_derivative(self, points, deltas, interp="linear", extrap="hold"):
         points = list(points)
         deltas = list(deltas)
@@ -242,6 +549,22 @@ class NDTable(object):
             'Unknown extrapolation method "%s"' % extrap
         )
 
+        if self.noutputs is None:
+            return self._evaluate_derivative(
+                self._table, points, deltas, interp, extrap
+            )
+
+        return np.stack(
+            [
+                self._evaluate_derivative(table, points, deltas, interp, extrap)
+                for table in self._output_tables()
+            ],
+            axis=-1,
+        )
+
+    def _evaluate_derivative(self, table, points, deltas, interp, extrap):
+        shape = points[0].shape
+
         interp_method = c_int(self._interp_methods[interp])
         extrap_method = c_int(self._extrap_methods[extrap])
         value = c_double()
@@ -257,7 +580,7 @@ class NDTable(object):
                 delta_params[i] = delta[index]
 
             _evaluate_derivative(
-                c_void_p(self._table),
+                c_void_p(table),
                 c_int(params.size),
                 params.ctypes.data_as(c_void_p),
                 delta_params.ctypes.data_as(c_void_p),
@@ -269,5 +592,123 @@ class NDTable(object):
 
         return out
 
+    def evaluate_gradient(
+        self, points, interp="linear", extrap="hold", return_value=False
+    ):
+        """
+        Evaluate the gradient of the lookup table at the coordinates in `points`.
+
+        Returns an array of the shape of the coordinates in `points` + (ndims,)
+        (+ (noutputs, ndims) for vector-valued tables) with the partial
+        derivatives with respect to the coordinates. For linear interpolation
+        the gradients of all points are computed in batches (vector-valued
+        tables compute the brackets of a point once for the values and all
+        partial derivatives). Otherwise the partial derivatives are the
+        directional derivatives along the unit vectors.
+
+        If `return_value` is True the tuple (values, gradients) is returned.
+        """
+
+        points = list(points)
+
+        for i, _ in enumerate(points):
+            points[i] = np.asarray(points[i], np.float64)
+
+        shape = points[0].shape
+
+        for p in points[1:]:
+            assert p.shape == shape, "The arrays in points must have the same shape"
+
+        assert len(points) == len(self.scales), (
+            "The number of coordinates must match the number of scales"
+        )
+        assert interp in self._interp_methods, (
+            'Unknown interpolation method "%s"' % interp
+        )
+        assert extrap in self._extrap_methods, (
+            'Unknown extrapolation method "%s"' % extrap
+        )
+
+        if self.noutputs is None:
+            values, gradients = self._evaluate_gradient(
+                self._table, points, interp, extrap
+            )
+        elif interp == "linear" and len(self.scales) <= _max_linear_dims:
+            values, gradients = _evaluate_linear(
+                self.data, self.scales, points, extrap, gradient=True
+            )
+        else:
+            results = [
+                self._evaluate_gradient(table, points, interp, extrap)
+                for table in self._output_tables()
+            ]
+            values = np.stack([v for v, _ in results], axis=-1)
+            gradients = np.stack([g for _, g in results], axis=-2)
+
+        return (values, gradients) if return_value else gradients
+
+    def _evaluate_gradient(self, table, points, interp, extrap):
+        ndims = len(points)
+        shape = points[0].shape
+
+        values = self._evaluate(table, points, interp, extrap)
+
+        if interp == "linear":
+            return values, self._linear_gradient(table, points, extrap)
+
+        # one directional derivative per dimension
+        gradients = np.stack(
+            [
+                self._evaluate_derivative(
+                    table,
+                    points,
+                    [np.full(shape, float(i == j)) for j in range(ndims)],
+                    interp,
+                    extrap,
+                )
+                for i in range(ndims)
+            ],
+            axis=-1,
+        )
+
+        return values, gradients
+
+    def _linear_gradient(self, table, points, extrap):
+        """Evaluate the gradient of a table with multi-linear interpolation
+
+        Inside a cell the interpolation is linear along every dimension, so a
+        partial derivative is the difference of the values on the two faces of
+        the cell divided by its width. The cells are found with one search per
+        dimension for all points and the values on the faces are evaluated in
+        batches (2 * ndims calls to the shared library).
+        """
+
+        gradients = np.zeros(points[0].shape + (len(points),))
+
+        for d, (scale, point) in enumerate(zip(self.scales, points)):
+            if scale.size == 1:
+                continue
+
+            i = np.searchsorted(scale, point, side="right") - 1
+            i = np.clip(i, 0, scale.size - 2)
+
+            faces = []
+
+            for face in [scale[i], scale[i + 1]]:
+                points_ = list(points)
+                points_[d] = face
+                faces.append(self._evaluate(table, points_, "linear", extrap))
+
+            slope = (faces[1] - faces[0]) / (scale[i + 1] - scale[i])
+
+            if extrap == "hold":
+                # the value is constant outside the scale
+                slope[(point < scale[0]) | (point > scale[-1])] = 0.0
+
+            gradients[..., d] = slope
+
+        return gradients
+
     def __del__(self):
-        self._close_table(self._table)
+        for table in getattr(self, "_tables", None) or []:
+            self._close_table(table)
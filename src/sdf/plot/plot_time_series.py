@@ -1,10 +1,11 @@
 import sdf
+import sdf.decimation
 import matplotlib.pyplot as plt
 import numpy as np
 import matplotlib.pylab as pylab
 
 
-def plot_time_series(filename, datasets):
+def plot_time_series(filename, datasets, n_bins=2000):
     params = {
         # 'legend.fontsize': 'medium',
         "figure.figsize": (10, 8),
@@ -22,7 +23,8 @@ def plot_time_series(filename, datasets):
     figure.patch.set_facecolor("white")
 
     for ax, path in zip(axes, datasets):
-        dataset = sdf.load(filename, path)
+        # min/max decimate the dataset to the screen resolution
+        dataset = sdf.decimation.load(filename, path, n_bins=n_bins)
 
         scale = dataset.scales[0]
 
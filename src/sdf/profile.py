@@ -0,0 +1,222 @@
+"""
+Opt-in instrumentation of the I/O and interpolation functions
+
+While a Profile is active the calls of hdf5.load(), hdf5.save(), dsres.load()
+and NDTable.evaluate() are recorded with their wall time, the number of bytes
+read and written, the number of HDF5 objects and arrays created and the peak
+memory (if `memory` is True):
+
+    with sdf.profile.Profile(memory=True) as p:
+        sdf.load("file.sdf")
+
+    print(p.summary())
+
+To profile loading a file from the command line run
+
+    python -m sdf.profile FILE [OBJECTNAME]
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from attrs import define, field
+
+# the active profiles
+_profiles = []
+
+_lock = threading.Lock()
+
+# the open calls of the current thread
+_local = threading.local()
+
+
+@define
+class Call:
+    """The statistics of an instrumented call"""
+
+    name: str
+    args: tuple = ()
+    time: float = 0.0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    objects: int = 0
+    arrays: int = 0
+    peak_memory: int = None
+    depth: int = 0
+
+
+@define(eq=False)
+class Profile:
+    """Records the instrumented calls of all threads while it is active"""
+
+    memory: bool = False
+    calls: list[Call] = field(factory=list)
+    _tracing: bool = False
+
+    def __enter__(self) -> Profile:
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+        with _lock:
+            _profiles.append(self)
+
+        return self
+
+    def __exit__(self, *args):
+        with _lock:
+            _profiles.remove(self)
+
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def summary(self) -> dict[str, dict[str, int | float]]:
+        """Get the totals of the calls by name"""
+
+        totals = {}
+
+        for c in self.calls:
+            t = totals.setdefault(
+                c.name,
+                dict(
+                    calls=0,
+                    time=0.0,
+                    bytes_read=0,
+                    bytes_written=0,
+                    objects=0,
+                    arrays=0,
+                    peak_memory=None,
+                ),
+            )
+            t["calls"] += 1
+            t["time"] += c.time
+            t["bytes_read"] += c.bytes_read
+            t["bytes_written"] += c.bytes_written
+            t["objects"] += c.objects
+            t["arrays"] += c.arrays
+            if c.peak_memory is not None:
+                t["peak_memory"] = max(t["peak_memory"] or 0, c.peak_memory)
+
+        return totals
+
+
+def active() -> bool:
+    """Return True if a Profile is active"""
+
+    return bool(_profiles)
+
+
+@contextmanager
+def call(name: str, *args):
+    """Record a call if a Profile is active"""
+
+    if not _profiles:
+        yield None
+        return
+
+    stack = getattr(_local, "stack", None)
+
+    if stack is None:
+        stack = _local.stack = []
+
+    c = Call(name, args, depth=len(stack))
+
+    # the peak memory is measured for the top-level calls
+    memory = not stack and tracemalloc.is_tracing()
+
+    if memory:
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+
+    stack.append(c)
+    start = time.perf_counter()
+
+    try:
+        yield c
+    finally:
+        c.time = time.perf_counter() - start
+        stack.pop()
+
+        if memory:
+            c.peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+
+        with _lock:
+            for profile in _profiles:
+                profile.calls.append(c)
+
+
+def add(bytes_read: int = 0, bytes_written: int = 0, objects: int = 0, arrays: int = 0):
+    """Add to the counters of the open calls of the current thread"""
+
+    if not _profiles:
+        return
+
+    for c in getattr(_local, "stack", ()):
+        c.bytes_read += bytes_read
+        c.bytes_written += bytes_written
+        c.objects += objects
+        c.arrays += arrays
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m sdf.profile", description="Profile loading an SDF file"
+    )
+    parser.add_argument("filename", help="SDF or Dymola result file")
+    parser.add_argument("objectname", nargs="?", default="/", help="object to load")
+    args = parser.parse_args(args)
+
+    import sdf
+    from sdf import cache, dsres, hdf5  # noqa: F401 (imported before the measurement)
+
+    # the instrumented functions record to sdf.profile (not __main__)
+    from sdf.profile import Profile, call
+
+    # measure a cold read
+    cache.enabled = False
+    cache.catalogs = False
+
+    with Profile(memory=True) as p, call("sdf.load", args.filename):
+        obj = sdf.load(args.filename, args.objectname)
+
+        # the datasets of Dymola results are read on the first access
+        cache._sizeof(obj)
+
+    print(
+        "%-20s %6s %10s %12s %12s %8s %8s %12s"
+        % (
+            "call",
+            "calls",
+            "time [s]",
+            "read [B]",
+            "written [B]",
+            "objects",
+            "arrays",
+            "peak [B]",
+        )
+    )
+
+    for name, t in p.summary().items():
+        print(
+            "%-20s %6d %10.4f %12d %12d %8d %8d %12s"
+            % (
+                name,
+                t["calls"],
+                t["time"],
+                t["bytes_read"],
+                t["bytes_written"],
+                t["objects"],
+                t["arrays"],
+                t["peak_memory"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,7 @@ class Table(object):
 
     def get(self, row_key, column_key):
         if row_key in self._rows:
-            return self._rows[row_key][column_key]
+            return self._rows[row_key].get(column_key)
         else:
             return None
 
@@ -0,0 +1,130 @@
+"""
+Virtual SDF files that aggregate datasets of many files
+
+stack() creates an SDF file with HDF5 virtual datasets that stack a dataset of
+files with the same structure (e.g. the results of a parameter sweep) along a
+new first dimension with its own scale. No data is copied and the file can be
+loaded with sdf.load() like any other SDF file as long as the source files
+exist at their (absolute) paths.
+"""
+
+from __future__ import annotations
+
+import os
+from os import PathLike
+
+import h5py
+from attrs import evolve
+
+import sdf
+from .hdf5 import _scale_attributes, _str, _write_dataset
+
+
+def stack(
+    outfile: str | PathLike,
+    filenames: list[str | PathLike],
+    objectnames: str | list[str],
+    scale: sdf.Dataset,
+) -> str:
+    """Stack datasets of many SDF files in a virtual SDF file
+
+    Parameters
+    ----------
+    outfile : str
+        The virtual SDF file to create.
+    filenames : list[str]
+        The SDF files to stack (all with the same structure).
+    objectnames : str or list[str]
+        The paths of the datasets to stack (e.g. "/a/b/x").
+    scale : sdf.Dataset
+        The scale of the new first dimension (e.g. the swept parameter) with
+        one value per file. It is stored in the root group of `outfile`.
+
+    Returns
+    -------
+    outfile : str
+        The name of the virtual SDF file.
+    """
+
+    if isinstance(objectnames, str):
+        objectnames = [objectnames]
+
+    sources = [os.path.abspath(os.fspath(filename)) for filename in filenames]
+
+    if len(scale.data) != len(sources):
+        raise Exception("The scale must have one value per file")
+
+    outfile = os.fspath(outfile)
+
+    # check that the datasets of all files match the first file
+    with h5py.File(sources[0], "r") as first:
+        layouts = {name: (first[name].shape, first[name].dtype) for name in objectnames}
+
+    for source in sources[1:]:
+        with h5py.File(source, "r") as src:
+            for name, (shape, dtype) in layouts.items():
+                other = src.get(name)
+                if (
+                    not isinstance(other, h5py.Dataset)
+                    or other.shape != shape
+                    or other.dtype != dtype
+                ):
+                    raise Exception(
+                        "'%s' in %s does not match the first file" % (name, source)
+                    )
+
+    with h5py.File(sources[0], "r") as first, h5py.File(outfile, "w") as f:
+        datasets = {}
+        _write_dataset(f, evolve(scale, is_scale=True), "/", datasets)
+        (h5scale,) = datasets.values()
+
+        # paths of the scales in the first file -> virtual scales
+        scales = {}
+
+        for objectname in objectnames:
+            dsobj = first[objectname]
+
+            vds = _virtual_dataset(f, sources, dsobj, stacked=True)
+            vds.dims[0].attach_scale(h5scale)
+
+            for i, dim in enumerate(dsobj.dims):
+                if len(dim) == 0:
+                    continue
+
+                sobj = dim[0]
+
+                if sobj.name not in scales:
+                    vscale = _virtual_dataset(f, sources[:1], sobj)
+                    h5py.h5ds.set_scale(vscale.id, _str(sobj.attrs.get("NAME", b"")))
+                    scales[sobj.name] = vscale
+
+                vds.dims[i + 1].attach_scale(scales[sobj.name])
+
+    return outfile
+
+
+def _virtual_dataset(f, sources, dsobj, stacked=False):
+    """Create a virtual dataset that maps `dsobj` in the `sources`"""
+
+    if stacked:
+        layout = h5py.VirtualLayout(
+            shape=(len(sources),) + dsobj.shape, dtype=dsobj.dtype
+        )
+        for i, source in enumerate(sources):
+            layout[i] = h5py.VirtualSource(source, dsobj.name, shape=dsobj.shape)
+    else:
+        layout = h5py.VirtualLayout(shape=dsobj.shape, dtype=dsobj.dtype)
+        layout[...] = h5py.VirtualSource(sources[0], dsobj.name, shape=dsobj.shape)
+
+    parent = dsobj.name.rsplit("/", 1)[0]
+
+    if parent:
+        f.require_group(parent)
+
+    vds = f.create_virtual_dataset(dsobj.name, layout)
+
+    for name, value in dsobj.attrs.items():
+        if name not in _scale_attributes:
+            vds.attrs[name] = value
+
+    return vds
@@ -0,0 +1,118 @@
+"""
+Zone maps (per-block summaries) for predicate pushdown
+
+sdf.save() can store the minimum, maximum and number of NaNs of every block of
+rows of the 1-d datasets next to the data (see `zone_maps`). where() uses them
+to read only the blocks that can contain matching values.
+"""
+
+from __future__ import annotations
+
+import os
+from os import PathLike
+
+import h5py
+import numpy as np
+
+import sdf
+
+# number of rows of a block of datasets that are not chunked
+block_size = 65536
+
+# group of the zone maps
+_zone_maps_group = "/_sdf/zone_maps"
+
+
+def _write_zone_map(f: h5py.File, ds: sdf.Dataset, dsobj: h5py.Dataset) -> None:
+    """Write the zone map of a 1-d numeric dataset"""
+
+    data = np.asarray(ds.data)
+    rows = dsobj.chunks[0] if dsobj.chunks else block_size
+    n_full = data.size - data.size % rows
+
+    blocks = [data[:n_full].reshape(-1, rows)] if n_full else []
+
+    if n_full < data.size:
+        blocks.append(data[n_full:].reshape(1, -1))
+
+    lo = np.concatenate([_reduce(np.min, np.nanmin, b) for b in blocks])
+    hi = np.concatenate([_reduce(np.max, np.nanmax, b) for b in blocks])
+
+    if data.dtype.kind == "f":
+        nan_count = np.concatenate([np.isnan(b).sum(axis=1) for b in blocks])
+    else:
+        nan_count = np.zeros(lo.size, dtype=np.int64)
+
+    g = f.require_group(_zone_maps_group + dsobj.name)
+    g.attrs["BLOCK_SIZE"] = rows
+    g.attrs["MIN"] = np.nanmin(lo) if np.any(nan_count < rows) else np.nan
+    g.attrs["MAX"] = np.nanmax(hi) if np.any(nan_count < rows) else np.nan
+    g.attrs["NAN_COUNT"] = int(nan_count.sum())
+    g["min"] = lo
+    g["max"] = hi
+    g["nan_count"] = nan_count
+
+    if ds.is_scale and data.size > 1:
+        step = np.diff(data.astype(np.float64))
+        g.attrs["MONOTONIC"] = bool(np.all(step >= 0))
+        g.attrs["UNIFORM"] = bool(np.allclose(step, step[0]))
+
+
+def _reduce(func, nanfunc, blocks):
+    if blocks.dtype.kind != "f":
+        return func(blocks, axis=1)
+
+    # blocks that contain only NaNs
+    empty = np.all(np.isnan(blocks), axis=1)
+    values = np.full(blocks.shape[0], np.nan, dtype=blocks.dtype)
+
+    if not np.all(empty):
+        values[~empty] = nanfunc(blocks[~empty], axis=1)
+
+    return values
+
+
+def where(filename: str | PathLike, objectname: str, predicate) -> np.ndarray:
+    """Find the indices of the values of a 1-d dataset that match a predicate
+
+    `predicate(lo, hi)` must return (an array of) True where the range [lo, hi]
+    may contain matching values, e.g. `lambda lo, hi: hi > 100` for values
+    above 100 or `lambda lo, hi: (hi >= a) & (lo <= b)` for values in [a, b].
+    The values are tested with `predicate(values, values)`. Only the blocks
+    whose zone map may match are read.
+    """
+
+    with h5py.File(os.fspath(filename), "r") as f:
+        dsobj = f[objectname]
+
+        if dsobj.ndim != 1:
+            raise Exception("Dataset must be one-dimensional")
+
+        zone_map = f.get(_zone_maps_group + dsobj.name)
+
+        if zone_map is None:
+            # read the whole dataset
+            values = dsobj[()]
+            return np.flatnonzero(predicate(values, values))
+
+        rows = int(zone_map.attrs["BLOCK_SIZE"])
+
+        with np.errstate(invalid="ignore"):
+            candidates = np.asarray(
+                predicate(zone_map["min"][()], zone_map["max"][()]), dtype=bool
+            )
+
+        indices = []
+
+        # read the consecutive candidate blocks at once
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], candidates, [0]])))
+
+        for first, last in zip(edges[0::2], edges[1::2]):
+            start = first * rows
+            values = dsobj[start : min(last * rows, dsobj.shape[0])]
+            indices.append(start + np.flatnonzero(predicate(values, values)))
+
+        if not indices:
+            return np.empty(0, dtype=np.intp)
+
+        return np.concatenate(indices)
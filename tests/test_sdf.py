@@ -1,14 +1,90 @@
 # Copyright (c) 2017 Dassault Systemes. All rights reserved.
+import importlib.util
 import runpy
+import shutil
+import threading
+import time
 import unittest
+from unittest import mock
 from unittest import skipIf
 import numpy as np
 import math
 import sdf
+import sdf.cache
 import os
 import platform
 
 
+def _has_ndtable_library():
+    """Check if the NDTable shared library has been built"""
+
+    from sdf.ndtable import _load_library
+
+    try:
+        _load_library()
+    except OSError:
+        return False
+
+    return True
+
+
+def _read_mat4(filename):
+    """Read the matrices of a MAT v4 file"""
+
+    from sdf.dsres import _read_mat4_headers, _read_mat4_matrix
+
+    return {
+        name: np.asarray(_read_mat4_matrix(filename, header))
+        for name, header in _read_mat4_headers(filename).items()
+    }
+
+
+def _write_mat4(filename, matrices):
+    """Write 2-d arrays to a little-endian MAT v4 file"""
+
+    precision = {"f8": 0, "f4": 1, "i4": 2, "i2": 3, "u2": 4, "u1": 5}
+
+    with open(filename, "wb") as f:
+        for name, a in matrices.items():
+            a = np.asarray(a)
+            a = a.astype(a.dtype.newbyteorder("<"))
+            text = 1 if a.dtype == np.uint8 else 0
+            header = [precision[a.dtype.str[1:]] * 10 + text, *a.shape, 0]
+            f.write(np.array(header + [len(name) + 1], dtype="<i4").tobytes())
+            f.write(name.encode("ascii") + b"\0")
+            f.write(a.tobytes(order="F"))
+
+
+def _write_mat73(filename, matrices):
+    """Write 2-d arrays to a MAT v7.3 (HDF5) file"""
+
+    import h5py
+
+    with h5py.File(filename, "w", userblock_size=512) as f:
+        for name, a in matrices.items():
+            if a.dtype == np.uint8:
+                f[name] = a.T.astype(np.uint16)
+                f[name].attrs["MATLAB_class"] = np.bytes_("char")
+            else:
+                f[name] = a.T
+                f[name].attrs["MATLAB_class"] = np.bytes_("double")
+
+    with open(filename, "r+b") as f:
+        f.write(b"MATLAB 7.3 MAT-file".ljust(116))
+
+
+def _bin_normal(matrices):
+    """Convert the matrices of a Dymola result from binTrans to binNormal"""
+
+    aclass = matrices["Aclass"].copy()
+    aclass[3] = np.frombuffer(b"binNormal".ljust(aclass.shape[1]), dtype=np.uint8)
+
+    return dict(
+        {name: a.T for name, a in matrices.items() if name != "Aclass"},
+        Aclass=aclass,
+    )
+
+
 class Test(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -55,6 +131,427 @@ class Test(unittest.TestCase):
         self.assertEqual(g["d"].data.dtype, np.float64)
         self.assertEqual(g["i"].data.dtype, np.int32)
 
+    def test_scale_offset(self):
+        ds_t = sdf.Dataset("t", data=np.linspace(0, 1, 1001), is_scale=True)
+        ds_f = sdf.Dataset("f", data=np.sin(ds_t.data), scales=[ds_t])
+        ds_i = sdf.Dataset("i", data=np.arange(1001, dtype=np.int32), scales=[ds_t])
+        ds_b = sdf.Dataset("b", data=ds_f.data > 0.5, scales=[ds_t])
+
+        g = sdf.Group(name="/", datasets=[ds_t, ds_f, ds_i, ds_b])
+        self.assertEqual([], sdf.validate(g))
+
+        sdf.save("scale_offset.sdf", g, scale_offset=3)
+
+        g = sdf.load("scale_offset.sdf")
+
+        self.assertTrue(np.all(g["t"].data == ds_t.data))
+        self.assertTrue(np.allclose(g["f"].data, ds_f.data, atol=1e-3))
+        self.assertTrue(np.all(g["i"].data == ds_i.data))
+        self.assertEqual(g["b"].data.dtype, np.bool_)
+        self.assertTrue(np.all(g["b"].data == ds_b.data))
+
+    def test_compression_level(self):
+        import h5py
+        import sdf.chunks
+
+        ds_t = sdf.Dataset("t", data=np.linspace(0, 1, 10001), is_scale=True)
+        ds_f = sdf.Dataset("f", data=np.sin(ds_t.data), scales=[ds_t])
+        ds_b = sdf.Dataset("b", data=ds_f.data > 0.5, scales=[ds_t])
+        ds_2 = sdf.Dataset("m", data=np.arange(3003.0).reshape(1001, 3))
+
+        g = sdf.Group(name="/", datasets=[ds_t, ds_f, ds_b, ds_2])
+
+        # write many chunks and partial edge chunks
+        chunk_bytes = sdf.chunks.chunk_bytes
+        sdf.chunks.chunk_bytes = 1000
+        try:
+            sdf.save("compression.sdf", g, compression_level=6)
+        finally:
+            sdf.chunks.chunk_bytes = chunk_bytes
+
+        with h5py.File("compression.sdf", "r") as f:
+            self.assertEqual(f["f"].compression, "gzip")
+            self.assertTrue(f["f"].shuffle)
+            self.assertEqual(f["f"].chunks, (125,))
+            self.assertTrue(np.all(f["f"][()] == ds_f.data))
+            self.assertTrue(np.all(f["m"][()] == ds_2.data))
+
+        g = sdf.load("compression.sdf")
+
+        self.assertTrue(np.all(g["b"].data == ds_b.data))
+        self.assertIs(g["f"].scales[0], g["t"])
+
+    def test_parallel_read(self):
+        import h5py
+        import sdf.chunks
+
+        a = np.arange(100 * 30, dtype=">i4").reshape(100, 30)
+
+        with h5py.File("parallel_read.sdf", "w") as f:
+            # chunks along both axes with partial edge chunks
+            f.create_dataset(
+                "a", data=a, chunks=(16, 7), compression="gzip", shuffle=True
+            )
+            # unwritten chunks
+            dsobj = f.create_dataset(
+                "b", shape=(100,), dtype="f8", chunks=(10,), compression="gzip"
+            )
+            dsobj[25:55] = 1.0
+            # unsupported filter
+            f.create_dataset("c", data=a, chunks=(10, 10), compression="lzf")
+
+        with h5py.File("parallel_read.sdf", "r") as f:
+            for name in ["a", "b", "c"]:
+                data = sdf.chunks.read(f[name])
+                self.assertEqual(data.dtype, f[name].dtype)
+                self.assertTrue(np.all(data == f[name][()]))
+
+            self.assertEqual(len(sdf.chunks._chunk_offsets(f["b"])), 4)
+
+            # HDF5 without chunk iteration
+            with mock.patch.object(sdf.chunks, "_chunk_offsets", return_value=None):
+                for name in ["a", "b"]:
+                    self.assertTrue(np.all(sdf.chunks.read(f[name]) == f[name][()]))
+
+    def test_profile(self):
+        import sdf.profile
+
+        ds_t = sdf.Dataset("t", data=np.linspace(0, 1, 1001), is_scale=True)
+        ds_y = sdf.Dataset("y", data=np.sin(ds_t.data), scales=[ds_t])
+        g = sdf.Group(name="/", groups=[sdf.Group("g", datasets=[ds_t, ds_y])])
+
+        self.assertFalse(sdf.profile.active())
+
+        with sdf.profile.Profile(memory=True) as p:
+            self.assertTrue(sdf.profile.active())
+            sdf.save("profile.sdf", g)
+            sdf.load("profile.sdf", "/")
+
+        self.assertFalse(sdf.profile.active())
+
+        summary = p.summary()
+
+        self.assertEqual(summary["hdf5.save"]["bytes_written"], 2 * 8 * 1001)
+        self.assertEqual(summary["hdf5.save"]["objects"], 4)
+        self.assertEqual(summary["hdf5.load"]["arrays"], 2)
+        self.assertGreaterEqual(summary["hdf5.load"]["peak_memory"], 2 * 8 * 1001)
+        self.assertGreater(summary["hdf5.load"]["time"], 0)
+
+        # calls are not recorded without an active profile
+        sdf.load("profile.sdf", "/")
+        self.assertEqual(len(p.calls), 2)
+
+    def test_dumps_loads(self):
+        import io
+
+        ds_t = sdf.Dataset("t", data=np.linspace(0, 1, 11), unit="s", is_scale=True)
+        ds_y = sdf.Dataset("y", data=np.sin(ds_t.data), scales=[ds_t])
+        g = sdf.Group(name="/", datasets=[ds_t, ds_y])
+
+        content = sdf.dumps(g, compression_level=4)
+        self.assertTrue(content.startswith(b"\x89HDF"))
+
+        y = sdf.loads(content, "/y", scale_units=["s"])
+        self.assertTrue(np.all(y.data == ds_y.data))
+
+        f = io.BytesIO()
+        sdf.save(f, g)
+        f.seek(0)
+        self.assertTrue(np.all(sdf.load(f, "/t").data == ds_t.data))
+
+        # Dymola result
+        path = os.path.dirname(__file__)
+        filename = os.path.join(path, "DoublePendulum.mat")
+
+        with open(filename, "rb") as f:
+            phi = sdf.loads(f.read(), "/revolute1/phi")
+
+        self.assertTrue(np.all(phi.data == sdf.load(filename, "/revolute1/phi").data))
+
+    def test_open(self):
+        ds_t = sdf.Dataset("t", data=np.linspace(0, 1, 11), unit="s", is_scale=True)
+        ds_y = sdf.Dataset("y", data=np.sin(ds_t.data), unit="m", scales=[ds_t])
+        g = sdf.Group(name="/", datasets=[ds_t, ds_y])
+
+        sdf.save("open.sdf", g)
+
+        # load into the cache
+        sdf.load("open.sdf")
+
+        with sdf.open("open.sdf") as f:
+            # same shape (written in place)
+            f.replace("/y", sdf.Dataset("y", data=np.cos(ds_t.data), unit="mm"))
+            f.add("/sub", sdf.Dataset("z", data=np.zeros(11)), scales=["/t"])
+            f.set_attribute("/sub/z", "COMMENT", "zeros")
+
+        g = sdf.load("open.sdf")
+        self.assertTrue(np.all(g["y"].data == np.cos(ds_t.data)))
+        self.assertEqual(g["y"].unit, "mm")
+        self.assertIs(g["y"].scales[0], g["t"])
+        self.assertEqual(g["sub"]["z"].comment, "zeros")
+        self.assertIs(g["sub"]["z"].scales[0], g["t"])
+
+        with sdf.open("open.sdf") as f:
+            # new shape (recreated)
+            t = np.linspace(0, 1, 21)
+            f.replace("/t", sdf.Dataset("t", data=t, unit="s", is_scale=True))
+            f.replace("/y", sdf.Dataset("y", data=np.sin(t), unit="m"))
+            f.delete("/sub")
+
+        g = sdf.load("open.sdf")
+        self.assertEqual(g["y"].data.shape, (21,))
+        self.assertIs(g["y"].scales[0], g["t"])
+        self.assertEqual(g["t"].unit, "s")
+        self.assertEqual([], g.groups)
+        self.assertEqual([], sdf.validate(g))
+
+    def test_virtual_stack(self):
+        import sdf.virtual
+
+        t = np.linspace(0, 1, 11)
+        filenames = []
+
+        for i, k in enumerate([1.0, 2.0, 3.0]):
+            ds_t = sdf.Dataset("t", data=t, unit="s", is_scale=True)
+            ds_y = sdf.Dataset("y", data=k * t, unit="m", scales=[ds_t])
+            g = sdf.Group(name="/", groups=[sdf.Group("g", datasets=[ds_t, ds_y])])
+            filenames.append("sweep%d.sdf" % i)
+            sdf.save(filenames[-1], g)
+
+        k = sdf.Dataset("k", data=np.array([1.0, 2.0, 3.0]), unit="1")
+        sdf.virtual.stack("sweep.sdf", filenames, "/g/y", k)
+
+        y = sdf.load("sweep.sdf", "/g/y")
+
+        self.assertEqual(y.data.shape, (3, 11))
+        self.assertEqual(y.unit, "m")
+        self.assertTrue(np.all(y.data == np.outer([1.0, 2.0, 3.0], t)))
+        self.assertTrue(np.all(y.scales[0].data == k.data))
+        self.assertTrue(np.all(y.scales[1].data == t))
+        self.assertEqual(y.scales[1].unit, "s")
+
+    def test_find(self):
+        import re
+
+        path = os.path.dirname(__file__)
+        filename = os.path.join(path, "DoublePendulum.mat")
+
+        paths = list(sdf.find(filename, "*/phi", unit="rad"))
+        self.assertIn("/revolute1/phi", paths)
+        self.assertTrue(all(p.endswith("/phi") for p in paths))
+
+        constants = set(sdf.find(filename, re.compile("/revolute1/"), ndim=0))
+        self.assertIn("/revolute1/phi_offset", constants)
+        self.assertNotIn("/revolute1/phi", constants)
+
+        ds_t = sdf.Dataset("t", data=np.linspace(0, 1, 11), unit="s", is_scale=True)
+        ds_y = sdf.Dataset("y", data=np.sin(ds_t.data), unit="m", scales=[ds_t])
+        ds_c = sdf.Dataset("c", data=np.array(1.0), unit="m")
+        g = sdf.Group(
+            name="/", datasets=[ds_t], groups=[sdf.Group("a", datasets=[ds_y, ds_c])]
+        )
+        sdf.save("find.sdf", g, decimation_threshold=5)
+
+        for source in [g, "find.sdf"]:
+            self.assertEqual(["/a/c", "/a/y"], sorted(sdf.find(source, unit="m")))
+            self.assertEqual(["/a/y"], list(sdf.find(source, has_scale=True)))
+            self.assertEqual(["/t"], list(sdf.find(source, "/?")))
+
+    def test_zone_maps(self):
+        import h5py
+        import sdf.zonemaps
+
+        t = np.linspace(0, 10, 1001)
+        y = np.sin(t)
+        y[500:550] = np.nan
+        y[700] = 5.0
+
+        ds_t = sdf.Dataset("t", data=t, is_scale=True)
+        ds_y = sdf.Dataset("y", data=y, scales=[ds_t])
+        g = sdf.Group(name="/", datasets=[ds_t, ds_y])
+
+        block_size = sdf.zonemaps.block_size
+        sdf.zonemaps.block_size = 100
+        try:
+            sdf.save("zone_maps.sdf", g, zone_maps=True)
+        finally:
+            sdf.zonemaps.block_size = block_size
+
+        with h5py.File("zone_maps.sdf", "r") as f:
+            zone_map = f["/_sdf/zone_maps/y"]
+            self.assertEqual(zone_map["min"].shape, (11,))
+            self.assertEqual(zone_map.attrs["NAN_COUNT"], 50)
+            self.assertEqual(zone_map.attrs["MAX"], 5.0)
+            self.assertTrue(f["/_sdf/zone_maps/t"].attrs["MONOTONIC"])
+            self.assertTrue(f["/_sdf/zone_maps/t"].attrs["UNIFORM"])
+
+        with np.errstate(invalid="ignore"):
+            for predicate in [
+                lambda lo, hi: hi > 0.99,
+                lambda lo, hi: (hi >= -0.1) & (lo <= 0.1),
+                lambda lo, hi: lo > 10,
+            ]:
+                expected = np.flatnonzero(predicate(y, y))
+                indices = sdf.where("zone_maps.sdf", "/y", predicate)
+                self.assertTrue(np.array_equal(indices, expected))
+
+        self.assertEqual(
+            list(sdf.where("zone_maps.sdf", "/t", lambda lo, hi: lo > 9.995)), [1000]
+        )
+
+        # the zone map of a replaced dataset is removed
+        with sdf.open("zone_maps.sdf") as f:
+            f.replace("/y", sdf.Dataset("y", data=np.zeros(1001)))
+
+        with h5py.File("zone_maps.sdf", "r") as f:
+            self.assertNotIn("/_sdf/zone_maps/y", f)
+            self.assertIn("/_sdf/zone_maps/t", f)
+
+    def test_from_csv_xlsx(self):
+        import sdf.io
+
+        t = np.linspace(0, 1, 1001)
+        u = np.sin(t)
+
+        with open("table.csv", "w") as f:
+            f.write("label,time,u,empty/name\n")
+            f.write("unit,s,V,\n")
+            for i, (a, b) in enumerate(zip(t, u)):
+                f.write("row,%r,%r,%s\n" % (float(a), float(b), "" if i % 2 else "1"))
+
+        outfile = sdf.io.from_csv("table.csv", first_column=1, block_rows=100)
+        self.assertEqual(outfile, "table.sdf")
+
+        g = sdf.load(outfile)
+        self.assertEqual([ds.name for ds in g.datasets], ["empty_name", "time", "u"])
+
+        ds_u = g["u"]
+        self.assertEqual(ds_u.unit, "V")
+        self.assertTrue(np.array_equal(ds_u.data, u))
+        self.assertEqual(ds_u.scales[0].name, "time")
+        self.assertEqual(ds_u.scales[0].unit, "s")
+        self.assertTrue(np.array_equal(ds_u.scales[0].data, t))
+        self.assertEqual(np.isnan(g["empty_name"].data).sum(), 500)
+
+        # a UTF-8 byte order mark (e.g. written by Excel) is not part of the first name
+        with open("table.csv", "w", encoding="utf-8-sig") as f:
+            f.write("time,u\ns,V\n0,1\n1,2\n")
+
+        g = sdf.load(sdf.io.from_csv("table.csv"))
+        self.assertEqual([ds.name for ds in g.datasets], ["time", "u"])
+        self.assertIs(g["u"].scales[0], g["time"])
+
+        filename = os.path.join(
+            os.path.dirname(sdf.__file__), "examples", "time_series.xlsx"
+        )
+        outfile = sdf.io.from_xlsx(
+            filename, "time_series.sdf", first_column=1, block_rows=7
+        )
+
+        ds_u = sdf.load(outfile, "/u_ac")
+        self.assertEqual(ds_u.unit, "V")
+        self.assertEqual(ds_u.scales[0].name, "time")
+        self.assertEqual(ds_u.scales[0].unit, "s")
+        self.assertFalse(np.any(np.isnan(ds_u.data)))
+        self.assertEqual(ds_u.data.shape, ds_u.scales[0].data.shape)
+
+    def test_expr(self):
+        import h5py
+        import sdf.expr
+
+        t = np.linspace(0, 1, 1001)
+        ds_t = sdf.Dataset("t", data=t, unit="s", is_scale=True)
+        ds_u = sdf.Dataset("u", data=230 * np.sin(t), unit="V", scales=[ds_t])
+        ds_i = sdf.Dataset("i", data=np.cos(t), unit="A", scales=[ds_t])
+        ds_j = sdf.Dataset("j", data=np.arange(1001.0), unit="mA", scales=[ds_t])
+        g = sdf.Group(name="/", datasets=[ds_t, ds_u, ds_i, ds_j])
+        sdf.save("expr.sdf", g)
+
+        u = sdf.expr.load("expr.sdf", "/u")
+        i = sdf.expr.load("expr.sdf", "/i")
+        j = sdf.expr.load("expr.sdf", "/j")
+
+        self.assertEqual((u * i).unit, "V*A")
+        self.assertEqual((u / (i * i)).unit, "V/(A*A)")
+        self.assertEqual((i**2).unit, "A^2")
+        self.assertEqual((2 * i + 1).unit, "A")
+
+        # j is converted to A
+        total = (i + j).evaluate(block_rows=100)
+        self.assertEqual(total.unit, "A")
+        self.assertTrue(np.allclose(total.data, ds_i.data + ds_j.data / 1000))
+        self.assertTrue(np.array_equal(total.scales[0].data, t))
+
+        with self.assertRaises(Exception):
+            u + i
+
+        p = (u * i).with_unit("W").to("kW")
+
+        if os.path.exists("derived.sdf"):
+            os.remove("derived.sdf")
+
+        for parallel in [False, True]:
+            source = p.save(
+                "derived.sdf",
+                "/power/p%d" % parallel,
+                comment="Electrical power",
+                block_rows=100,
+                parallel=parallel,
+            )
+            self.assertEqual(source.unit, "kW")
+
+            ds_p = sdf.load("derived.sdf", "/power/p%d" % parallel)
+            self.assertEqual(ds_p.unit, "kW")
+            self.assertEqual(ds_p.comment, "Electrical power")
+            self.assertTrue(np.allclose(ds_p.data, ds_u.data * ds_i.data / 1000))
+
+            # the scale is copied once
+            self.assertEqual(ds_p.scales[0].name, "t")
+            self.assertEqual(ds_p.scales[0].unit, "s")
+            self.assertTrue(np.array_equal(ds_p.scales[0].data, t))
+
+        with h5py.File("derived.sdf", "r") as f:
+            self.assertEqual(f["/power/p0"].chunks, (100,))
+            self.assertEqual(list(f), ["power", "t"])
+
+        # write to the source file
+        (-u).save("expr.sdf", "/minus_u", compression_level=None)
+        ds = sdf.load("expr.sdf", "/minus_u")
+        self.assertTrue(np.array_equal(ds.data, -ds_u.data))
+        self.assertEqual(ds.scales[0].name, "t")
+
+        with self.assertRaises(Exception):
+            u.save("expr.sdf", "/minus_u")
+
+        # a scale with the same name and length but other values is not reused
+        with h5py.File("derived.sdf", "w") as f:
+            f["t"] = np.linspace(0, 2, 1001)
+
+        with self.assertRaises(Exception):
+            u.save("derived.sdf", "/u")
+
+        with h5py.File("derived.sdf", "r") as f:
+            self.assertEqual(list(f), ["t"])
+            self.assertTrue(np.array_equal(f["t"][()], np.linspace(0, 2, 1001)))
+
+        with self.assertRaises(TypeError):
+            sdf.expr.Expression()
+
+        # operands on other time axes are not combined
+        ds_t2 = sdf.Dataset("t", data=2 * t, unit="s", is_scale=True)
+        ds_v = sdf.Dataset("v", data=np.cos(t), unit="V", scales=[ds_t2])
+        sdf.save("expr2.sdf", sdf.Group(name="/", datasets=[ds_t2, ds_v]))
+        v = sdf.expr.load("expr2.sdf", "/v")
+
+        with self.assertRaises(ValueError):
+            u + v
+
+        # scales in other files with the same values
+        ds_t2.data = t
+        sdf.save("expr2.sdf", sdf.Group(name="/", datasets=[ds_t2, ds_v]))
+        v = sdf.expr.load("expr2.sdf", "/v")
+        self.assertTrue(np.allclose((u + v).evaluate().data, ds_u.data + ds_v.data))
+
     def test_roundtrip(self):
         # create a scale
         ds1 = sdf.Dataset(
@@ -256,9 +753,19 @@ class Test(unittest.TestCase):
         errors = sdf._validate_dataset(ds1)
         self.assertEqual(["Dataset.data must not be empty"], errors)
 
-        ds1.data = np.array(1).astype(np.float32)
+        ds1.data = np.array(1).astype(np.float16)
         errors = sdf._validate_dataset(ds1)
-        self.assertEqual(["Dataset.data.dtype must be numpy.float64"], errors)
+        self.assertEqual(
+            [
+                "Dataset.data.dtype must be numpy.float32, numpy.float64, an integer type or numpy.bool_"
+            ],
+            errors,
+        )
+
+        for dtype in [np.float32, np.float64, np.int32, np.uint8, np.bool_]:
+            ds1.data = np.array(1).astype(dtype)
+            errors = sdf._validate_dataset(ds1)
+            self.assertEqual([], errors)
 
         ds1.data = np.array([1.0, 2.0])
         errors = sdf._validate_dataset(ds1)
@@ -279,6 +786,10 @@ class Test(unittest.TestCase):
         errors = sdf._validate_dataset(ds2)
         self.assertEqual(["Scales must be strictly monotonic increasing"], errors)
 
+        ds2.data = np.array([0, 1, 2])
+        errors = sdf._validate_dataset(ds2)
+        self.assertEqual(["Scales must be numpy.float32 or numpy.float64"], errors)
+
     def test_dsres_load_all(self):
         path, _ = os.path.split(sdf.__file__)
         filename = os.path.join(path, "examples", "IntegerNetwork1.mat")
@@ -287,7 +798,7 @@ class Test(unittest.TestCase):
 
         s = g["Time"]
         self.assertEqual(s.data.size, 552)
-        # self.assertEqual(s.data.dtype, np.dtype(np.float32))
+        self.assertEqual(s.data.dtype, np.dtype(np.float32))
         self.assertEqual(s.unit, "s")
         self.assertEqual(s.comment, "Simulation time")
 
@@ -297,7 +808,7 @@ class Test(unittest.TestCase):
         self.assertEqual(ds.comment, "Time for one period")
 
         ds = g["booleanPulse2"]["y"]
-        self.assertEqual(ds.data.dtype, np.int32)
+        self.assertEqual(ds.data.dtype, np.bool_)
         self.assertEqual(ds.data.size, 552)
         self.assertEqual(ds.data[0], True)
         self.assertEqual(ds.data[93], False)
@@ -320,14 +831,14 @@ class Test(unittest.TestCase):
         self.assertEqual(ds.comment, "Time for one period")
 
         ds = sdf.load(filename, objectname="/booleanPulse2/y")
-        self.assertEqual(ds.data.dtype, np.dtype(np.int32))
+        self.assertEqual(ds.data.dtype, np.dtype(np.bool_))
         self.assertEqual(ds.data.size, 552)
         self.assertEqual(ds.data[0], True)
         self.assertEqual(ds.data[93], False)
 
         s = ds.scales[0]
         self.assertEqual(s.data.size, 552)
-        # self.assertEqual(s.data.dtype, np.dtype(np.float32))
+        self.assertEqual(s.data.dtype, np.dtype(np.float32))
         self.assertEqual(s.unit, "s")
         self.assertEqual(s.comment, "Simulation time")
 
@@ -341,6 +852,659 @@ class Test(unittest.TestCase):
         rvisobj = sdf.load(filename, "/world/y_label/cylinders[2]/rvisobj[1]")
         self.assertTrue(rvisobj.data < 0)
 
+    def test_cache(self):
+        import h5py
+
+        path, _ = os.path.split(sdf.__file__)
+        filename = os.path.join(path, "examples", "IntegerNetwork1.mat")
+
+        sdf.cache.clear()
+        enabled = sdf.cache.enabled
+        sdf.cache.enabled = True
+
+        try:
+            # the file is parsed only once
+            self.assertIs(sdf.dsres._catalog(filename), sdf.dsres._catalog(filename))
+
+            ds_t = sdf.Dataset("t", data=np.linspace(0, 1, 11), unit="s", is_scale=True)
+            ds_y = sdf.Dataset("y", data=np.sin(ds_t.data), scales=[ds_t])
+            g = sdf.Group("/", datasets=[ds_t, ds_y])
+            sdf.save("cache.sdf", g)
+
+            # the objects are copies that share read-only arrays
+            g1 = sdf.load("cache.sdf")
+            g2 = sdf.load("cache.sdf")
+            self.assertIsNot(g1, g2)
+            self.assertIs(g1["y"].scales[0], g1["t"])
+            self.assertIs(g1["t"].data, g2["t"].data)
+
+            with self.assertRaises(ValueError):
+                g1["t"].data[0] = 99
+
+            g1["t"].data = np.zeros(11)
+            self.assertEqual(sdf.load("cache.sdf", "/t").data[1], 0.1)
+
+            # the file is not kept open
+            with h5py.File("cache.sdf", "w"):
+                pass
+
+            # a file that has been rewritten with the same size and times
+            st = os.stat("cache.sdf")
+            sdf.save("cache.sdf", g)
+            self.assertEqual(sdf.load("cache.sdf", "/t").data[1], 0.1)
+            ds_t.data = np.linspace(0, 2, 11)
+            sdf.save("cache.sdf", g)
+            os.utime("cache.sdf", ns=(st.st_atime_ns, st.st_mtime_ns))
+            self.assertEqual(sdf.load("cache.sdf", "/t").data[1], 0.2)
+        finally:
+            sdf.cache.enabled = enabled
+            sdf.cache.clear()
+
+        # the catalogues of Dymola results are cached by default
+        from sdf.dsres import _Mat4Matrix
+
+        filename = os.path.join(os.path.dirname(__file__), "DoublePendulum.mat")
+        self.assertFalse(sdf.cache.enabled)
+        self.assertTrue(sdf.cache.catalogs)
+
+        phi = sdf.load(filename, "/revolute1/phi").data
+
+        with mock.patch.object(
+            _Mat4Matrix, "_read_block", autospec=True, side_effect=AssertionError
+        ) as m:
+            # the second signal and the signals of other groups are not reread
+            w = sdf.load(filename, "/revolute1/w").data
+            sdf.load(filename, "/revolute2/phi").data
+            self.assertEqual(m.call_count, 0)
+
+        self.assertEqual(phi.shape, w.shape)
+        self.assertTrue(w.flags.writeable)
+
+        sdf.cache.clear()
+
+    def test_resample(self):
+        # a time axis with an event at t = 1
+        ds_t = sdf.Dataset("t", data=np.array([0.0, 1.0, 1.0, 2.0]), is_scale=True)
+        ds_a = sdf.Dataset("a", data=np.array([0.0, 1.0, 3.0, 4.0]), scales=[ds_t])
+        ds_b = sdf.Dataset("b", data=np.array([1.0, 1.0, 0.0, 0.0]), scales=[ds_t])
+        ds_i = sdf.Dataset("i", data=np.array([1, 2, 3, 4]), scales=[ds_t])
+
+        t = np.array([-1.0, 0.5, 1.0, 1.5, 2.0, 3.0])
+
+        a, b, i = sdf.resample([ds_a, ds_b, ds_i], t)
+
+        self.assertTrue(np.allclose(a.data, [0.0, 0.5, 3.0, 3.5, 4.0, 4.0]))
+        self.assertTrue(np.allclose(b.data, [1.0, 1.0, 0.0, 0.0, 0.0, 0.0]))
+        self.assertTrue(np.all(i.data == [1, 1, 3, 3, 4, 4]))
+        self.assertEqual(i.data.dtype, ds_i.data.dtype)
+        self.assertIs(a.scales[0], b.scales[0])
+        self.assertTrue(np.all(a.scales[0].data == t))
+
+        (a,) = sdf.resample([ds_a], a.scales[0], method="hold")
+        self.assertTrue(np.all(a.data == [0.0, 0.0, 3.0, 3.0, 4.0, 4.0]))
+
+    def test_ndtable_vector_valued(self):
+        from scipy.interpolate import RegularGridInterpolator
+        from sdf.ndtable import NDTable
+
+        rng = np.random.default_rng(0)
+        x = np.array([0.0, 1.0, 3.0, 4.0])
+        y = np.array([-1.0, 0.0, 2.0])
+        z = np.array([0.0, 0.5])
+        data = rng.random((4, 3, 2, 5))
+
+        table = NDTable(data, (x, y, z))
+        self.assertEqual(table.noutputs, 5)
+
+        points = (rng.uniform(-1, 5, 100), rng.uniform(-2, 3, 100), rng.random(100))
+
+        for extrap in ["hold", "linear"]:
+            values = table.evaluate(points, extrap=extrap)
+            self.assertEqual(values.shape, (100, 5))
+
+            if extrap == "hold":
+                xi = [np.clip(p, s[0], s[-1]) for p, s in zip(points, (x, y, z))]
+            else:
+                xi = points
+
+            interpolator = RegularGridInterpolator(
+                (x, y, z), data, bounds_error=False, fill_value=None
+            )
+            expected = interpolator(np.stack(xi, axis=-1))
+            self.assertTrue(np.allclose(values, expected))
+
+    def test_ndtable_out(self):
+        from sdf.ndtable import NDTable
+
+        x = np.array([0.0, 1.0, 2.0])
+        table = NDTable(np.stack([x, 2 * x], axis=-1), (x,))
+
+        out = np.empty((4, 2))
+        values = table.evaluate((np.array([0.0, 0.5, 1.5, 3.0]),), out=out)
+
+        self.assertIs(values, out)
+        self.assertTrue(np.all(out[:, 0] == [0.0, 0.5, 1.5, 2.0]))
+        self.assertTrue(np.all(out[:, 1] == 2 * out[:, 0]))
+
+        with self.assertRaises(AssertionError):
+            table.evaluate((np.array([0.0, 0.5]),), out=out)
+
+    @skipIf(not _has_ndtable_library(), "Test requires the NDTable library")
+    def test_ndtable_scalar_bind_out(self):
+        from sdf.ndtable import NDTable
+
+        x = np.array([-1.0, 0.0, 1.0])
+        y = np.array([-1.0, 0.0, 2.0])
+        X, Y = np.meshgrid(x, y, indexing="ij")
+        table = NDTable(X * Y, (x, y))
+        self.assertIsNone(table.noutputs)
+        self.assertIsNone(table.data)
+
+        # the bilinear interpolation of x * y is exact
+        f = table.bind()
+        self.assertIsInstance(f(0.5, -0.5), float)
+        self.assertAlmostEqual(f(0.5, -0.5), -0.25)
+        self.assertAlmostEqual(f(-0.5, 1.5), -0.75)
+
+        # the values are held outside the scales
+        self.assertAlmostEqual(f(2.0, 3.0), 2.0)
+        self.assertAlmostEqual(table.bind(extrap="linear")(2.0, 3.0), 6.0)
+
+        points = (
+            np.array([[0.5, -0.5], [1.0, 0.0]]),
+            np.array([[-0.5, 1.5], [2.0, 0.0]]),
+        )
+        expected = table.evaluate(points)
+
+        out = np.empty((2, 2))
+        values = table.evaluate(points, out=out)
+        self.assertIs(values, out)
+        self.assertTrue(np.allclose(out, points[0] * points[1]))
+        self.assertTrue(np.array_equal(out, expected))
+
+        for p0, p1, value in zip(points[0].ravel(), points[1].ravel(), out.ravel()):
+            self.assertEqual(f(p0, p1), value)
+
+        with self.assertRaises(AssertionError):
+            table.evaluate(points, out=np.empty(4))
+
+        with self.assertRaises(AssertionError):
+            table.evaluate(points, out=np.empty((2, 2), dtype=np.float32))
+
+    def test_ndtable_sort_points(self):
+        from sdf.ndtable import NDTable, _morton_order
+
+        rng = np.random.default_rng(1)
+        scales = [np.linspace(0, 1, 50), np.linspace(0, 1, 40), np.linspace(0, 1, 3)]
+        table = NDTable(rng.random((50, 40, 3, 2)), scales)
+
+        points = [rng.random((20, 30)) for _ in scales]
+
+        expected = table.evaluate(points)
+        values = table.evaluate(points, sort_points=True)
+        self.assertTrue(np.array_equal(values, expected))
+
+        order = _morton_order(scales, [p.ravel() for p in points])
+        self.assertTrue(np.array_equal(np.sort(order), np.arange(600)))
+
+        # consecutive points are in nearby cells
+        cells = np.searchsorted(scales[0], points[0].ravel()[order])
+        self.assertLess(np.mean(np.abs(np.diff(cells))), 10)
+
+    def test_ndtable_gradient(self):
+        from sdf.ndtable import NDTable
+
+        rng = np.random.default_rng(2)
+        x = np.array([0.0, 1.0, 3.0])
+        y = np.array([-1.0, 0.0, 2.0, 2.5])
+        table = NDTable(rng.random((3, 4, 2)), (x, y))
+
+        points = (rng.uniform(-0.5, 3.5, 50), rng.uniform(-1.5, 3.0, 50))
+
+        for extrap in ["hold", "linear"]:
+            values, gradients = table.evaluate_gradient(
+                points, extrap=extrap, return_value=True
+            )
+            self.assertEqual(gradients.shape, (50, 2, 2))
+            self.assertTrue(np.allclose(values, table.evaluate(points, extrap=extrap)))
+
+            # central differences
+            h = 1e-6
+            for d in range(2):
+                lo = [p - h * (i == d) for i, p in enumerate(points)]
+                hi = [p + h * (i == d) for i, p in enumerate(points)]
+                expected = (
+                    table.evaluate(hi, extrap=extrap)
+                    - table.evaluate(lo, extrap=extrap)
+                ) / (2 * h)
+                self.assertTrue(np.allclose(gradients[..., d], expected, atol=1e-4))
+
+    @skipIf(not _has_ndtable_library(), "Test requires the NDTable library")
+    def test_ndtable_scalar_gradient(self):
+        from sdf.ndtable import NDTable, _evaluate_linear
+
+        rng = np.random.default_rng(3)
+        scales = (
+            np.array([0.0, 1.0, 3.0]),
+            np.array([-1.0, 0.0, 2.0, 2.5]),
+            np.array([0.0, 0.5, 1.0]),
+        )
+        data = rng.random((3, 4, 3))
+        table = NDTable(data, scales)
+
+        inside = tuple(rng.uniform(s[0], s[-1], (10, 5)) for s in scales)
+        outside = tuple(rng.uniform(s[0] - 1, s[-1] + 1, (10, 5)) for s in scales)
+
+        for interp, extrap, points in [
+            ("linear", "hold", outside),
+            ("linear", "linear", outside),
+            ("akima", "hold", inside),
+        ]:
+            values, gradients = table.evaluate_gradient(
+                points, interp=interp, extrap=extrap, return_value=True
+            )
+            self.assertEqual(gradients.shape, (10, 5, 3))
+            self.assertTrue(np.allclose(values, table.evaluate(points, interp, extrap)))
+
+            if interp == "linear":
+                # the scalar table is the case K = 1 of a vector-valued table
+                _, expected = _evaluate_linear(
+                    data[..., np.newaxis], scales, points, extrap, gradient=True
+                )
+                self.assertTrue(np.allclose(gradients, expected[..., 0, :]))
+
+            # central differences
+            h = 1e-6
+            for d in range(3):
+                lo = [p - h * (i == d) for i, p in enumerate(points)]
+                hi = [p + h * (i == d) for i, p in enumerate(points)]
+                expected = (
+                    table.evaluate(hi, interp, extrap)
+                    - table.evaluate(lo, interp, extrap)
+                ) / (2 * h)
+                self.assertTrue(np.allclose(gradients[..., d], expected, atol=1e-4))
+
+    def test_lazy_imports(self):
+        import subprocess
+        import sys
+
+        # see benchmarks/import_time.py for the import time
+        modules = ("numpy", "scipy", "h5py", "sdf.ndtable")
+
+        code = "import sys, sdf\nprint(' '.join(m for m in %r if m in sys.modules))"
+
+        output = subprocess.check_output(
+            [sys.executable, "-c", code % (modules,)], text=True
+        )
+
+        # heavy dependencies are imported on first use
+        self.assertEqual("", output.strip())
+
+    def test_aio_load(self):
+        import asyncio
+        import sdf.aio
+        import sdf.dsres
+
+        path, _ = os.path.split(sdf.__file__)
+        filename = os.path.join(path, "examples", "IntegerNetwork1.mat")
+
+        async def load_concurrently():
+            return await asyncio.gather(
+                sdf.aio.load(filename, "/booleanPulse2/y"),
+                sdf.aio.load(filename, "/booleanPulse2/y"),
+                sdf.aio.load(filename, "/booleanPulse2/period", unit="s"),
+            )
+
+        load = sdf.load
+
+        def slow_load(*args):
+            time.sleep(0.1)
+            return load(*args)
+
+        enabled = sdf.cache.enabled
+        sdf.cache.enabled = False
+
+        try:
+            data = sdf.dsres.Catalog.data
+            threads = []
+
+            def read_data(*args):
+                threads.append(threading.current_thread())
+                return data(*args)
+
+            with (
+                mock.patch.object(sdf, "load", side_effect=slow_load) as m,
+                mock.patch.object(
+                    sdf.dsres.Catalog, "data", autospec=True, side_effect=read_data
+                ),
+            ):
+                ds1, ds2, ds3 = asyncio.run(load_concurrently())
+
+                # concurrent requests for the same object are coalesced
+                self.assertEqual(m.call_count, 2)
+                self.assertEqual(ds1.data.size, 552)
+                self.assertEqual(ds3.data, 2.0)
+
+                # every caller gets its own objects with the shared read-only data
+                self.assertIsNot(ds1, ds2)
+                self.assertIsNot(ds1.scales[0], ds2.scales[0])
+                self.assertIs(ds1.data, ds2.data)
+                self.assertFalse(ds1.data.flags.writeable)
+
+                # the data has been read on the thread pool
+                self.assertTrue(threads)
+                self.assertNotIn(threading.main_thread(), threads)
+
+                async def cancel_and_load():
+                    task = asyncio.ensure_future(
+                        sdf.aio.load(filename, "/booleanPulse2/y")
+                    )
+                    await asyncio.sleep(0.02)
+                    task.cancel()
+                    with self.assertRaises(asyncio.CancelledError):
+                        await task
+                    # waits for the running read
+                    return await sdf.aio.load(filename, "/booleanPulse2/y")
+
+                m.reset_mock()
+                ds = asyncio.run(cancel_and_load())
+                self.assertEqual(m.call_count, 1)
+                self.assertEqual(ds.data.size, 552)
+        finally:
+            sdf.cache.enabled = enabled
+
+        with self.assertRaises(Exception):
+            asyncio.run(sdf.aio.load(filename, "/booleanPulse2/period", unit="V"))
+
+    @skipIf(importlib.util.find_spec("pyarrow") is None, "Test requires pyarrow")
+    def test_to_parquet(self):
+        import pyarrow.parquet as pq
+        import sdf.arrow
+
+        t = np.linspace(0, 1, 1001)
+        ds_t = sdf.Dataset("t", data=t, unit="s", is_scale=True)
+        ds_u = sdf.Dataset("u", data=np.sin(t), unit="V", scales=[ds_t])
+        ds_i = sdf.Dataset("i", data=np.cos(t), unit="A", scales=[ds_t])
+        ds_k = sdf.Dataset("k", data=np.array(2.0))
+        g1 = sdf.Group("g1", datasets=[ds_i])
+        g = sdf.Group("/", datasets=[ds_t, ds_u, ds_k], groups=[g1])
+        sdf.save("arrow.sdf", g)
+
+        for source in [g, "arrow.sdf"]:
+            filenames = sdf.arrow.to_parquet(source, "arrow", chunk_size=300)
+            self.assertEqual([os.path.join("arrow", "t.parquet")], filenames)
+
+            f = pq.ParquetFile(filenames[0])
+            self.assertEqual(f.metadata.num_row_groups, 4)
+            self.assertEqual(f.schema_arrow.field("u").metadata[b"unit"], b"V")
+
+            table = f.read()
+            self.assertEqual(sorted(table.column_names), ["g1/i", "t", "u"])
+            self.assertTrue(np.all(table["g1/i"].to_numpy() == ds_i.data))
+
+        # the trajectories of Dymola results are read in blocks of rows
+        filename = os.path.join(os.path.dirname(__file__), "DoublePendulum.mat")
+
+        read = sdf.arrow._Rows.__call__
+
+        with mock.patch.object(sdf.arrow._Rows, "__call__", autospec=True) as m:
+            m.side_effect = read
+            batches = list(
+                sdf.arrow.to_record_batches(filename, "/revolute1", chunk_size=100)
+            )
+
+        blocks = {c.args[1:] for c in m.call_args_list}
+        self.assertEqual(blocks, {(i, min(i + 100, 502)) for i in range(0, 502, 100)})
+        self.assertEqual({"Time"}, {name for name, _ in batches})
+        self.assertEqual(len(batches), 6)
+
+        phi = np.concatenate([b.column("phi").to_numpy() for _, b in batches])
+        expected = sdf.load(filename, "/revolute1/phi")
+        self.assertTrue(np.all(phi == expected.data))
+        self.assertEqual(batches[0][1].schema.field("phi").metadata[b"unit"], b"rad")
+
+    def test_convert(self):
+        import h5py
+        from sdf.convert import convert
+
+        path = os.path.dirname(__file__)
+        filename = os.path.join(path, "DoublePendulum.mat")
+
+        # use small blocks and chunks to stream the trajectories in several
+        # blocks per chunk and several chunks
+        convert(filename, "DoublePendulum.sdf", block_size=4096, chunk_bytes=800)
+
+        with h5py.File("DoublePendulum.sdf", "r") as f:
+            # 800 bytes of float32
+            self.assertEqual(f["/revolute1/phi"].chunks, (200,))
+
+        for objectname in [
+            "/world/y_label/cylinders[2]/rvisobj[1]",
+            "/revolute1/phi",
+            "/revolute1/frame_b/R/T[1, 1]",
+        ]:
+            ds1 = sdf.load(filename, objectname)
+            ds2 = sdf.load("DoublePendulum.sdf", objectname)
+            self.assertTrue(np.all(ds1.data == ds2.data))
+            self.assertEqual(ds1.comment, ds2.comment)
+
+        convert(filename, "DoublePendulum2.sdf", compression_level=None)
+        ds = sdf.load("DoublePendulum2.sdf", "/revolute1/phi")
+        self.assertTrue(np.all(ds.data == sdf.load(filename, "/revolute1/phi").data))
+
+        ds = sdf.load("DoublePendulum.sdf", "/revolute1/phi")
+        self.assertEqual(ds.unit, "rad")
+        self.assertEqual(ds.display_unit, "deg")
+        self.assertEqual(ds.scales[0].name, "Time")
+        self.assertEqual(ds.scales[0].data.size, 502)
+
+        # data_2 of a "binNormal" file is read once
+        _write_mat4("DoublePendulumNormal.mat", _bin_normal(_read_mat4(filename)))
+
+        with sdf.profile.Profile() as p, sdf.profile.call("convert"):
+            convert(
+                "DoublePendulumNormal.mat",
+                "DoublePendulumNormal.sdf",
+                block_size=4096,
+                chunk_bytes=800,
+            )
+
+        bytes_read = p.summary()["convert"]["bytes_read"]
+        self.assertLessEqual(bytes_read, os.path.getsize(filename) * 1.1)
+
+        for objectname in ["/revolute1/phi", "/revolute1/frame_b/R/T[1, 1]"]:
+            ds1 = sdf.load(filename, objectname)
+            ds2 = sdf.load("DoublePendulumNormal.sdf", objectname)
+            self.assertTrue(np.all(ds1.data == ds2.data))
+            self.assertTrue(np.all(ds1.scales[0].data == ds2.scales[0].data))
+
+    def test_decimation(self):
+        import sdf.decimation
+
+        t = np.linspace(0, 100, 100001)
+        v = np.sin(t)
+        v[50000] = 2.0  # a peak
+        ds_t = sdf.Dataset("t", data=t, unit="s", is_scale=True)
+        ds_v = sdf.Dataset("v", data=v, unit="V", scales=[ds_t])
+        g = sdf.Group("/", datasets=[ds_t, ds_v])
+
+        ds = ds_v.decimate(n_bins=100)
+        self.assertEqual(ds.data.size, 200)
+        self.assertEqual(ds.data.max(), 2.0)
+        self.assertEqual(ds.scales[0].unit, "s")
+
+        sdf.save("decimation.sdf", g, decimation_threshold=1000)
+
+        # the decimated levels are not part of the SDF tree
+        self.assertEqual(["t", "v"], [obj.name for obj in sdf.load("decimation.sdf")])
+
+        for x_range in [None, (49.0, 51.0), (49.99, 50.01)]:
+            ds = sdf.decimation.load("decimation.sdf", "/v", 100, x_range)
+            self.assertLessEqual(ds.data.size, 200)
+            self.assertEqual(ds.data.max(), 2.0)
+            self.assertEqual(ds.unit, "V")
+            self.assertEqual(ds.scales[0].unit, "s")
+
+        ds = sdf.decimation.load("decimation.sdf", "/v", 100, (49.99, 50.01))
+        self.assertTrue(np.all(ds.data == v[49989:50012]))
+
+        # only the samples of the range are read from the levels
+        import h5py
+
+        getitem = h5py.Dataset.__getitem__
+        reads = []
+
+        def read(dsobj, *args, **kwargs):
+            reads.append((dsobj.name, dsobj.shape[0], args[0] if args else None))
+            return getitem(dsobj, *args, **kwargs)
+
+        with mock.patch.object(h5py.Dataset, "__getitem__", read):
+            ds = sdf.decimation.load("decimation.sdf", "/v", 10, (49.0, 51.0))
+
+        self.assertEqual(ds.data.max(), 2.0)
+        self.assertTrue(
+            np.all((ds.scales[0].data >= 48.9) & (ds.scales[0].data <= 51.1))
+        )
+
+        levels = [r for r in reads if r[0].startswith("/_sdf/")]
+        self.assertTrue(levels)
+
+        for _, size, key in reads:
+            # single samples (binary search) or slices of the range
+            if isinstance(key, slice):
+                self.assertLess(key.stop - key.start, size / 10)
+            else:
+                self.assertIsInstance(key, int)
+
+    def test_dsres_catalog(self):
+        from sdf.dsres import Catalog, _read_mat
+
+        path = os.path.dirname(__file__)
+        filename = os.path.join(path, "DoublePendulum.mat")
+
+        catalog = Catalog(*_read_mat(filename))
+
+        # units and comments are stored once
+        self.assertLess(len(catalog.strings), len(catalog.names) / 2)
+
+        # no datasets are created before they are accessed
+        g = catalog.get("/revolute1")
+        self.assertEqual(g.name, "revolute1")
+        self.assertFalse(g._loaded)
+
+        # the data is read when it is accessed
+        ds = g["phi"]
+        self.assertFalse(ds._loaded)
+        self.assertEqual(ds.unit, "rad")
+        self.assertIs(ds.scales[0], g["w"].scales[0])
+        self.assertEqual(ds.scales[0].name, "Time")
+        self.assertFalse(ds.scales[0]._loaded)
+        self.assertIsNone(catalog.get("/revolute1/psi"))
+
+        # every dataset gets its own array and the size of the catalogue is bounded
+        nbytes = catalog.nbytes
+        expected = catalog.get("/revolute1/phi")
+        self.assertIsNot(ds, expected)
+        self.assertTrue(np.all(ds.data == expected.data))
+        self.assertIsNot(ds.data, expected.data)
+        self.assertTrue(ds.data.flags.writeable)
+        self.assertEqual(catalog.nbytes, nbytes)
+
+        # data_2 is read once for the whole tree
+        sdf.cache.clear()
+
+        with sdf.profile.Profile() as p, sdf.profile.call("load"):
+            g = sdf.load(filename)
+            sdf.cache._sizeof(g)
+
+        bytes_read = p.summary()["load"]["bytes_read"]
+        self.assertGreater(bytes_read, 0)
+        self.assertLessEqual(bytes_read, os.path.getsize(filename) * 1.1)
+
+        # truncate a copy of the file after loading
+        shutil.copy(filename, "DoublePendulumTruncated.mat")
+        g = sdf.load("DoublePendulumTruncated.mat", "/revolute1")
+
+        with open("DoublePendulumTruncated.mat", "r+b") as f:
+            f.truncate(os.path.getsize(filename) // 2)
+
+        with self.assertRaises(Exception):
+            g["phi"].data
+
+    def test_load_mat73(self):
+        import h5py
+
+        path = os.path.dirname(__file__)
+        filename = os.path.join(path, "DoublePendulum.mat")
+        matrices = _read_mat4(filename)
+
+        expected = sdf.load(filename, "/revolute1/phi")
+
+        for layout, m in [("binTrans", matrices), ("binNormal", _bin_normal(matrices))]:
+            with self.subTest(layout=layout):
+                _write_mat73("DoublePendulum73.mat", m)
+
+                ds = sdf.load("DoublePendulum73.mat", "/revolute1/phi")
+
+                self.assertEqual(ds.unit, expected.unit)
+                self.assertEqual(ds.comment, expected.comment)
+                self.assertTrue(np.all(ds.data == expected.data))
+                self.assertTrue(np.all(ds.scales[0].data == expected.scales[0].data))
+
+                g = sdf.load("DoublePendulum73.mat", "/")
+                self.assertEqual(len(g.groups), len(sdf.load(filename, "/").groups))
+
+                # the (cached) catalogue does not keep the file open
+                with h5py.File("DoublePendulum73.mat", "w"):
+                    pass
+
+                os.remove("DoublePendulum73.mat")
+
+    def test_dsres_follower(self):
+        from sdf.dsres import Follower, _read_mat4_headers
+
+        path = os.path.dirname(__file__)
+        filename = os.path.join(path, "DoublePendulum.mat")
+
+        with open(filename, "rb") as f:
+            content = f.read()
+
+        # a file with 100 complete rows and an incomplete row
+        _, (nvars, _), offset = _read_mat4_headers(filename)["data_2"]
+        size = offset + 100 * nvars * 4 + 10
+
+        with open("follow.mat", "wb") as f:
+            f.write(content[:size])
+
+        follower = Follower(
+            "follow.mat", ["/Time", "/revolute1/phi", "/revolute1/n[3]"]
+        )
+
+        values = follower.poll()
+        self.assertEqual(values["/Time"].shape, (100,))
+        self.assertEqual(values["/revolute1/n[3]"].shape, (100,))
+
+        self.assertEqual(follower.poll()["/Time"].shape, (0,))
+
+        # append the rest of the file
+        with open("follow.mat", "ab") as f:
+            f.write(content[size:])
+
+        rest = follower.poll()
+
+        phi = sdf.load(filename, "/revolute1/phi")
+        self.assertTrue(
+            np.all(
+                np.concatenate([values["/revolute1/phi"], rest["/revolute1/phi"]])
+                == phi.data
+            )
+        )
+        self.assertTrue(
+            np.all(
+                np.concatenate([values["/Time"], rest["/Time"]]) == phi.scales[0].data
+            )
+        )
+
     @skipIf(platform.system() != "Windows", "Test requires display")
     def test_interp_1d_example(self):
         runpy.run_module("sdf.examples.interp_1d")